@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import mod3_legalClause
+import mod5_LangSimple
+from model_registry import current_backend, model_revision
+
+# Bump when the shape of cached results changes
+CACHE_SCHEMA_VERSION = 6
+
+
+# -----------------------------------------------------------
+# Fingerprints
+# -----------------------------------------------------------
+_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+
+
+def model_fingerprint(profile: str = "quality") -> str:
+    """
+    Hash of everything that influences analysis output: model names, their
+    revisions in the local Hub cache, the inference backend, the decoding
+    profile and the cache schema. No model is loaded to compute it, and it
+    is computed once per (profile, backend).
+    Any change here invalidates both cache levels.
+    """
+    key = (profile, current_backend())
+    with _fingerprint_lock:
+        fingerprint = _fingerprints.get(key)
+        if fingerprint is None:
+            parts = {
+                "schema": CACHE_SCHEMA_VERSION,
+                "backend": key[1],
+                "classifier": mod3_legalClause.model_name,
+                "classifier_revision": model_revision(mod3_legalClause.model_name),
+                "labels": mod3_legalClause.clause_labels,
+                "windowing": [mod3_legalClause.WINDOW_OVERLAP, mod3_legalClause.DEFAULT_AGGREGATION],
+                "simplifier": mod5_LangSimple.simplifier_model_name,
+                "simplifier_revision": model_revision(mod5_LangSimple.simplifier_model_name),
+                "profile": mod5_LangSimple.DECODING_PROFILES.get(profile, profile),
+                "simplify_gate": [mod5_LangSimple.GATE_THRESHOLD, mod5_LangSimple.GATE_WEIGHTS.tolist()],
+            }
+            fingerprint = hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+            _fingerprints[key] = fingerprint
+        return fingerprint
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_clause(text: str) -> str:
+    """Whitespace-insensitive key for a clause."""
+    return " ".join(text.split()) if text else ""
+
+
+# -----------------------------------------------------------
+# Level 1: whole documents (on disk)
+# -----------------------------------------------------------
+class DocumentCache:
+    """
+    Maps (document SHA-256, model fingerprint) -> stored results list.
+    Entries are JSON files in `directory`; least recently used files are
+    removed once more than `max_entries` are stored.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc_hash: str, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{doc_hash}-{fingerprint[:16]}.json")
+
+    def get(self, doc_hash: str, fingerprint: str):
+        path = self._path(doc_hash, fingerprint)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                results = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # mark as recently used
+        return results
+
+    def put(self, doc_hash: str, fingerprint: str, results: list):
+        path = self._path(doc_hash, fingerprint)
+        # Per process and thread: forked workers can share a thread ident
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(results, fh, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+            entries.sort()
+            for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# -----------------------------------------------------------
+# Level 2: single clauses (in memory)
+# -----------------------------------------------------------
+class ClauseCache:
+    """
+    LRU map of normalized clause text -> {"type", "confidence", "terms", "simple"}.
+    Entries are scoped to a model fingerprint; switching fingerprints clears them.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def _check_fingerprint(self, fingerprint: str):
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, text: str, fingerprint: str):
+        key = normalize_clause(text)
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, text: str, fingerprint: str, analysis: dict):
+        key = normalize_clause(text)
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            self._entries[key] = analysis
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+clause_cache = ClauseCache()
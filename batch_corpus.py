@@ -0,0 +1,319 @@
+"""
+Bulk analysis of a directory of contracts.
+
+    python batch_corpus.py ARCHIVE_DIR OUT_DIR --workers 8 --profile fast
+
+Extraction and preprocessing run in a process pool; the model stages run
+in this process over batches that span several documents. Results are
+written as sharded JSONL (`shard-00000.jsonl`, ...), one line per
+document. `manifest.jsonl` records every finished file, so rerunning the
+same command after an interruption skips work that is already done. A
+document interrupted between its shard line and its manifest line is
+analyzed again, so keep the last record per path when reading shards.
+With --db, every analyzed batch is also written to a results_store
+SQLite database in one transaction. A file whose worker process dies
+(segfault, OOM) is recorded as an error and the pool is restarted; the
+other files in flight at the time are retried one at a time to find it.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from mod1_docingestion import ExtractionError
+from pipeline import preprocess_document, analyze_clauses
+from analysis_cache import hash_file, model_fingerprint
+from results_store import ResultsStore
+from metrics import tracing
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+MANIFEST_NAME = "manifest.jsonl"
+SHARD_PATTERN = "shard-{:05d}.jsonl"
+
+
+# -----------------------------------------------------------
+# Corpus walking and the checkpoint manifest
+# -----------------------------------------------------------
+def iter_corpus(root: str):
+    """Yield every supported file under `root`, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def file_key(path: str, root: str) -> dict:
+    """Identity of a file in the manifest: relative path plus size and mtime."""
+    st = os.stat(path)
+    return {"path": os.path.relpath(path, root), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_manifest(out_dir: str) -> dict:
+    """Latest manifest entry per relative path; a torn last line is ignored."""
+    entries = {}
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def is_finished(entry: dict, key: dict, retry_errors: bool) -> bool:
+    if entry is None or entry["size"] != key["size"] or entry["mtime_ns"] != key["mtime_ns"]:
+        return False
+    return entry["status"] == "done" or not retry_errors
+
+
+def _append_durably(fh, record: dict):
+    fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+class ShardWriter:
+    """Appends one JSON line per document, starting a new shard every `shard_size` documents."""
+
+    def __init__(self, out_dir: str, shard_size: int = 1000):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        # Never reopen shards from an earlier run; a crash may have torn their last line
+        self.index = sum(1 for name in os.listdir(out_dir) if name.startswith("shard-"))
+        self.count = 0
+        self._fh = None
+
+    @property
+    def name(self) -> str:
+        return SHARD_PATTERN.format(self.index)
+
+    def write(self, record: dict) -> str:
+        if self._fh is None or self.count >= self.shard_size:
+            self.close()
+            if self.count >= self.shard_size:
+                self.index += 1
+            self._fh = open(os.path.join(self.out_dir, self.name), "a", encoding="utf-8")
+            self.count = 0
+        _append_durably(self._fh, record)
+        self.count += 1
+        return self.name
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+# -----------------------------------------------------------
+# Worker side: extract + preprocess one file
+# -----------------------------------------------------------
+def preprocess_file(path: str) -> dict:
+    """
+    Runs in the pool. PDF extraction stays in this worker (workers=1).
+    Any failure is returned as an error entry, so one bad file is recorded
+    in the manifest instead of stopping the run.
+    """
+    with tracing() as trace:
+        try:
+            clauses = preprocess_document(path, workers=1)
+            digest = hash_file(path)
+        except (ExtractionError, OSError) as e:
+            return {"path": path, "error": str(e), "trace": trace.to_dict()}
+        except Exception as e:
+            return {"path": path, "error": f"{type(e).__name__}: {e}", "trace": trace.to_dict()}
+    return {"path": path, "sha256": digest, "clauses": clauses, "trace": trace.to_dict()}
+
+
+# -----------------------------------------------------------
+# Driver
+# -----------------------------------------------------------
+class CorpusRun:
+    """One pass over a corpus directory; see the module docstring."""
+
+    def __init__(self, input_dir: str, out_dir: str, workers: int = None, profile: str = "fast",
+                 batch_clauses: int = 256, shard_size: int = 1000, retry_errors: bool = False,
+                 store: ResultsStore = None, log=print):
+        self.input_dir = input_dir
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.profile = profile
+        self.batch_clauses = batch_clauses
+        self.shard_size = shard_size
+        self.retry_errors = retry_errors
+        self.store = store
+        self.log = log
+        self.stage_seconds = defaultdict(float)
+        self.documents = 0
+        self.errors = 0
+        self.clauses = 0
+        self.skipped = 0
+        self.started = None
+
+    def pending_files(self) -> list:
+        manifest = load_manifest(self.out_dir)
+        pending = []
+        for path in iter_corpus(self.input_dir):
+            key = file_key(path, self.input_dir)
+            if is_finished(manifest.get(key["path"]), key, self.retry_errors):
+                self.skipped += 1
+            else:
+                pending.append(path)
+        return pending
+
+    def _finish(self, item: dict, results, shards: ShardWriter, manifest_fh):
+        key = file_key(item["path"], self.input_dir)
+        record = {"path": key["path"], "sha256": item.get("sha256")}
+        if "error" in item:
+            record["error"] = item["error"]
+            self.errors += 1
+        else:
+            record["clauses"] = results
+            self.clauses += len(results)
+        shard = shards.write(record)
+        _append_durably(manifest_fh, {**key, "status": "error" if "error" in item else "done", "shard": shard})
+        self.documents += 1
+
+    def _analyze_batch(self, batch: list, shards: ShardWriter, manifest_fh):
+        """Run the model stages once over the clauses of every document in `batch`."""
+        processed = [c for item in batch for c in item["clauses"]]
+        with tracing() as trace:
+            results = analyze_clauses(processed, profile=self.profile)
+        for stage, seconds in trace.stages.items():
+            self.stage_seconds[stage] += seconds
+
+        per_document, offset = [], 0
+        for item in batch:
+            n = len(item["clauses"])
+            doc_results = results[offset:offset + n]
+            for i, result in enumerate(doc_results):
+                result["index"] = i + 1
+            offset += n
+            per_document.append(doc_results)
+
+        if self.store is not None:
+            self.store.save_documents(
+                [(item["sha256"], os.path.relpath(item["path"], self.input_dir), doc_results)
+                 for item, doc_results in zip(batch, per_document)],
+                fingerprint=model_fingerprint(self.profile))
+        for item, doc_results in zip(batch, per_document):
+            self._finish(item, doc_results, shards, manifest_fh)
+        self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.documents / elapsed if elapsed > 0 else 0.0
+        stages = "  ".join(f"{stage} {seconds:.1f}s" for stage, seconds in sorted(self.stage_seconds.items()))
+        self.log(f"{self.documents} docs ({self.errors} errors, {self.clauses} clauses) "
+                 f"{rate:.2f} docs/s | {stages}")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Spawned, like the jobs.py pool: workers never inherit this process's models
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def run(self) -> dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        pending = self.pending_files()
+        self.log(f"{len(pending)} files to process, {self.skipped} already finished")
+        self.started = time.perf_counter()
+
+        files = iter(pending)
+        shards = ShardWriter(self.out_dir, self.shard_size)
+        batch, batch_size = [], 0
+        pool = self._new_pool()
+        in_flight = {}  # future -> (path, whether it was the only file in the pool)
+        suspects = []   # files in flight when a worker died; retried one at a time
+
+        def fill():
+            if suspects:
+                if not in_flight:
+                    path = suspects.pop(0)
+                    in_flight[pool.submit(preprocess_file, path)] = (path, True)
+                return
+            # Keep a couple of files queued per worker, never the whole corpus
+            while len(in_flight) < self.workers * 2:
+                path = next(files, None)
+                if path is None:
+                    return
+                in_flight[pool.submit(preprocess_file, path)] = (path, False)
+
+        try:
+            with open(os.path.join(self.out_dir, MANIFEST_NAME), "a", encoding="utf-8") as manifest_fh:
+                fill()
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    broken = False
+                    for future in done:
+                        path, alone = in_flight.pop(future)
+                        try:
+                            item = future.result()
+                        except BrokenProcessPool as e:
+                            broken = True
+                            if not alone:
+                                suspects.append(path)
+                                continue
+                            item = {"path": path, "error": f"worker process died: {e}", "trace": {"stages": {}}}
+                        for stage, seconds in item["trace"]["stages"].items():
+                            self.stage_seconds[stage] += seconds
+                        if "error" in item:
+                            self._finish(item, None, shards, manifest_fh)
+                        else:
+                            batch.append(item)
+                            batch_size += len(item["clauses"])
+                    if broken:
+                        # The rest of the pool's files fail with it; requeue them as suspects
+                        suspects.extend(path for path, _ in in_flight.values())
+                        in_flight.clear()
+                        pool.shutdown(wait=False)
+                        pool = self._new_pool()
+                    fill()
+                    if batch and (batch_size >= self.batch_clauses or not in_flight):
+                        self._analyze_batch(batch, shards, manifest_fh)
+                        batch, batch_size = [], 0
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            shards.close()
+
+        self.report()
+        return {
+            "documents": self.documents,
+            "errors": self.errors,
+            "clauses": self.clauses,
+            "skipped": self.skipped,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "stage_seconds": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze every PDF/DOCX/TXT file under a directory.")
+    parser.add_argument("input_dir", help="directory to walk for contracts")
+    parser.add_argument("out_dir", help="directory for JSONL shards and the checkpoint manifest")
+    parser.add_argument("--workers", type=int, default=None, help="extraction/preprocessing processes")
+    parser.add_argument("--profile", default="fast", help="simplification decoding profile")
+    parser.add_argument("--batch-clauses", type=int, default=256,
+                        help="clauses collected across documents before each model pass")
+    parser.add_argument("--shard-size", type=int, default=1000, help="documents per JSONL shard")
+    parser.add_argument("--retry-errors", action="store_true", help="reprocess files that failed before")
+    parser.add_argument("--db", help="also store results in this SQLite database")
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.db) if args.db else None
+    summary = CorpusRun(args.input_dir, args.out_dir, workers=args.workers, profile=args.profile,
+                        batch_clauses=args.batch_clauses, shard_size=args.shard_size,
+                        retry_errors=args.retry_errors, store=store).run()
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+End-to-end benchmark for the ClauseEase pipeline.
+
+Times every stage separately (mod1 extraction, mod2 segmentation and
+preprocessing, mod3 classification, mod4 term matching, mod5 simplification
+and PDF report generation) on synthetic contracts and real fixtures, and
+reports throughput, p50/p95 latency and peak RSS. Stages call the same
+entry points as pipeline.py: "preprocess" is preprocess_contract_pages
+(segmentation included) and "terms" matches over the whole Document.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --sizes 10,100,1000 --stand-in
+    python -m benchmarks.bench_pipeline --stand-in --save-baseline
+    python -m benchmarks.bench_pipeline --stand-in --threshold 0.2   # exits 1 on regression
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import resource
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_FIXTURES = [os.path.join(ROOT, "employment_agreement.pdf")]
+STAGES = ["extract", "segment", "preprocess", "classify", "terms", "simplify", "report"]
+# Bumped when a stage starts timing different code; older baselines are not compared
+BENCH_VERSION = 2
+
+# Timings below this many seconds are too noisy to flag as regressions
+NOISE_FLOOR_SECONDS = 0.005
+
+
+# -----------------------------------------------------------
+# Measurement helpers
+# -----------------------------------------------------------
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sample list."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def time_call(fn, repeat: int):
+    """Run `fn` `repeat` times; return (last result, list of durations in seconds)."""
+    durations, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+# -----------------------------------------------------------
+# Benchmark one document
+# -----------------------------------------------------------
+def bench_document(path: str, stages: list, repeat: int, profile: str) -> dict:
+    import mod1_docingestion
+    import mod2_preprocess
+    import mod3_legalClause
+    import mod4_legalTermRec
+    import mod5_LangSimple
+    from document_model import Document
+
+    report = {}
+
+    def record(stage, fn, units):
+        result, durations = time_call(fn, repeat)
+        p50 = percentile(durations, 50)
+        report[stage] = {
+            "p50_s": round(p50, 6),
+            "p95_s": round(percentile(durations, 95), 6),
+            "throughput_per_s": round(units / p50, 2) if p50 > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        return result
+
+    # mod1 -- always run, the later stages need its pages
+    extract = lambda: list(mod1_docingestion.iter_document(path))
+    pages = record("extract", extract, 1) if "extract" in stages else extract()
+
+    # mod2
+    def segment():
+        segmenter = mod2_preprocess.ClauseSegmenter()
+        for page, text in pages:
+            segmenter.feed(text, page=page)
+        segmenter.finish()
+        return [node for node in segmenter.clauses() if node.text]
+    n = len(segment())
+    if "segment" in stages:
+        record("segment", segment, n)
+    preprocess = lambda: mod2_preprocess.preprocess_contract_pages(pages)
+    processed = record("preprocess", preprocess, n) if "preprocess" in stages else preprocess()
+    cleaned = [c["cleaned_text"] for c in processed]
+
+    # mod3
+    types = [{"label": "Unknown"}] * n
+    if "classify" in stages:
+        types = record("classify", lambda: mod3_legalClause.detect_clause_types(cleaned), n)
+
+    # mod4 -- a fresh Document per run, so its cached lowercased buffer is part of the cost
+    terms = [{}] * n
+    if "terms" in stages:
+        terms = record("terms", lambda: mod4_legalTermRec.recognize_document_terms(
+            Document.from_processed(processed), mod4_legalTermRec.legal_terms), n)
+
+    # mod5 -- clear the sentence memo so every repeat measures real generation
+    simple = [""] * n
+    if "simplify" in stages:
+        def simplify():
+            mod5_LangSimple.clear_simplify_cache()
+            return mod5_LangSimple.simplify_document(cleaned, profile=profile)
+        simple = record("simplify", simplify, n)
+
+    # PDF report
+    if "report" in stages:
+        try:
+            from report_pdf import write_results_pdf
+        except ImportError:
+            report["report"] = {"skipped": "reportlab is not installed"}
+        else:
+            results = [{"index": i + 1, "cleaned": cleaned[i], "type": types[i]["label"],
+                        "terms": terms[i], "simple": simple[i]} for i in range(n)]
+            record("report", lambda: write_results_pdf(results, os.path.basename(path), io.BytesIO()), n)
+
+    return {"clauses": n, "stages": report}
+
+
+# -----------------------------------------------------------
+# Baseline comparison
+# -----------------------------------------------------------
+def find_regressions(current: dict, baseline: dict, threshold: float) -> list:
+    """Return human-readable lines for every stage whose p50 regressed past `threshold`."""
+    regressions = []
+    for case, data in current["cases"].items():
+        base_case = baseline.get("cases", {}).get(case)
+        if not base_case:
+            continue
+        for stage, stats in data["stages"].items():
+            base = base_case["stages"].get(stage)
+            if not base or "p50_s" not in base or "p50_s" not in stats:
+                continue
+            limit = base["p50_s"] * (1 + threshold)
+            if stats["p50_s"] > limit and stats["p50_s"] - base["p50_s"] > NOISE_FLOOR_SECONDS:
+                regressions.append(f"{case}/{stage}: p50 {stats['p50_s']:.4f}s vs baseline "
+                                   f"{base['p50_s']:.4f}s (+{(stats['p50_s'] / base['p50_s'] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(current: dict):
+    print(f"{'case':<28}{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'clauses/s':>12}{'peak MiB':>10}")
+    for case, data in current["cases"].items():
+        for stage, s in data["stages"].items():
+            if "skipped" in s:
+                print(f"{case:<28}{stage:<12}  skipped: {s['skipped']}")
+                continue
+            tput = f"{s['throughput_per_s']:.1f}" if s["throughput_per_s"] else "-"
+            print(f"{case:<28}{stage:<12}{s['p50_s'] * 1000:>10.2f}{s['p95_s'] * 1000:>10.2f}"
+                  f"{tput:>12}{s['peak_rss_mb']:>10.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ClauseEase pipeline stage by stage.")
+    parser.add_argument("--sizes", default="10,100,1000",
+                        help="comma-separated synthetic contract sizes in clauses (10 to 5000)")
+    parser.add_argument("--fixtures", nargs="*", default=DEFAULT_FIXTURES,
+                        help="real documents to benchmark as well")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to time")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--profile", default="fast", help="simplification decoding profile")
+    parser.add_argument("--stand-in", action="store_true",
+                        help="use tiny local stand-in models (offline, no downloads)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed p50 slowdown versus baseline before failing (0.15 = 15%%)")
+    parser.add_argument("--json-out", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    if args.stand_in:
+        from benchmarks.stand_ins import install_stand_ins
+        install_stand_ins()
+
+    from benchmarks.synthetic import write_contract
+    stages = [s for s in args.stages.split(",") if s]
+    current = {
+        "env": {"python": platform.python_version(), "machine": platform.machine(),
+                "cpus": os.cpu_count(), "stand_in": args.stand_in, "profile": args.profile,
+                "bench_version": BENCH_VERSION},
+        "cases": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="clauseease-bench-") as tmp:
+        documents = [(f"synthetic-{int(n)}", write_contract(tmp, int(n))) for n in args.sizes.split(",") if n]
+        documents += [(os.path.basename(p), p) for p in args.fixtures if os.path.exists(p)]
+        for case, path in documents:
+            current["cases"][case] = bench_document(path, stages, args.repeat, args.profile)
+
+    print_table(current)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("env", {}).get("stand_in") != args.stand_in:
+            print("\nBaseline was recorded with a different model setup; skipping comparison.")
+            return 0
+        if baseline.get("env", {}).get("bench_version") != BENCH_VERSION:
+            print("\nBaseline was recorded with older stage definitions; re-record it with --save-baseline.")
+            return 0
+        regressions = find_regressions(current, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions beyond threshold:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions beyond threshold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import re
+import tempfile
+
+import model_registry
+from benchmarks.synthetic import CLAUSE_TEMPLATES, SECTION_HEADINGS, PARTIES, CITIES, COUNTRIES
+
+# -----------------------------------------------------------
+# Tiny local stand-ins for the registry models (no downloads)
+# -----------------------------------------------------------
+# The stand-ins keep the real code paths (tokenizer, padding, forward pass,
+# generate, spaCy pipe) but with randomly initialised two-layer models, so
+# stage timings track our own overhead rather than model quality.
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def _build_vocab_file(directory: str) -> str:
+    words = set()
+    for text in CLAUSE_TEMPLATES + SECTION_HEADINGS + PARTIES + CITIES + COUNTRIES:
+        words.update(re.findall(r"\w+|[^\w\s]", text.lower()))
+    words.update("abcdefghijklmnopqrstuvwxyz0123456789")
+    path = os.path.join(directory, "vocab.txt")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(SPECIAL_TOKENS + sorted(words)))
+    return path
+
+
+_tokenizer = None
+
+
+def _tiny_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import BertTokenizerFast
+        directory = tempfile.mkdtemp(prefix="clauseease-standin-")
+        _tokenizer = BertTokenizerFast(vocab_file=_build_vocab_file(directory), do_lower_case=True)
+    return _tokenizer
+
+
+def _load_punkt():
+    # regex sentence splitter: avoids needing the NLTK punkt data offline
+    def sent_tokenize(text):
+        return [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+    return sent_tokenize
+
+
+def _load_spacy():
+    import spacy
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def _load_legal_bert():
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification
+    torch.manual_seed(0)
+    tokenizer = _tiny_tokenizer()
+    config = BertConfig(vocab_size=tokenizer.vocab_size, hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=64,
+                        num_labels=model_registry.LEGAL_BERT_NUM_LABELS)
+    model = BertForSequenceClassification(config)
+    model.eval()
+    return tokenizer, model
+
+
+def _load_t5():
+    import torch
+    from transformers import T5Config, T5ForConditionalGeneration, pipeline
+    torch.manual_seed(0)
+    tokenizer = _tiny_tokenizer()
+    config = T5Config(vocab_size=tokenizer.vocab_size, d_model=32, d_ff=64, d_kv=16,
+                      num_layers=2, num_heads=2,
+                      pad_token_id=tokenizer.pad_token_id,
+                      eos_token_id=tokenizer.sep_token_id,
+                      decoder_start_token_id=tokenizer.pad_token_id)
+    model = T5ForConditionalGeneration(config)
+    model.eval()
+    return pipeline("text2text-generation", model=model, tokenizer=tokenizer)
+
+
+def install_stand_ins():
+    """Replace every registry loader with its tiny offline stand-in."""
+    model_registry.register_loader("punkt", _load_punkt)
+    model_registry.register_loader("spacy", _load_spacy)
+    model_registry.register_loader("spacy_batch", _load_spacy)
+    model_registry.register_loader("legal_bert", _load_legal_bert)
+    model_registry.register_loader("t5", _load_t5)
@@ -0,0 +1,62 @@
+import os
+import random
+
+# -----------------------------------------------------------
+# Synthetic contract generator
+# -----------------------------------------------------------
+SECTION_HEADINGS = [
+    "DEFINITIONS", "TERM", "CONFIDENTIALITY", "INDEMNITY", "TERMINATION",
+    "LIMITATION OF LIABILITY", "WARRANTIES", "FORCE MAJEURE", "DISPUTE RESOLUTION",
+    "GOVERNING LAW", "MISCELLANEOUS",
+]
+
+CLAUSE_TEMPLATES = [
+    "The {a} shall keep all Confidential Information disclosed by the {b} in strict confidentiality and shall not disclose it to any third party without prior written consent.",
+    "The {a} shall indemnify and hold harmless the {b} from any liability, loss or damage arising out of a breach of this Agreement.",
+    "Either Party may terminate this Agreement by giving {n} days' written notice to the other Party.",
+    "Notwithstanding anything to the contrary contained herein, the {a} shall not be liable for any indirect or consequential loss.",
+    "Any dispute arising under this Agreement shall be resolved by arbitration seated in {city}.",
+    "This Agreement shall be governed by and construed in accordance with the laws of {country}, and the courts at {city} shall have exclusive jurisdiction.",
+    "The {a} warrants that the services will be performed with reasonable skill and care. This warranty survives termination.",
+    "Neither Party shall be responsible for failure to perform due to force majeure, including acts of God, war, strikes or epidemics.",
+    "The {a} shall pay the fees set out in Schedule {n} within {n} days of receipt of a valid invoice.",
+    "This Agreement constitutes the entire agreement between the Parties and supersedes all prior understandings.",
+]
+
+PARTIES = ["Company", "Employee", "Supplier", "Customer", "Licensor", "Licensee"]
+CITIES = ["Mumbai", "Delhi", "London", "Singapore", "New York"]
+COUNTRIES = ["India", "England and Wales", "Singapore", "the State of New York"]
+
+
+def generate_clause(rng: random.Random) -> str:
+    a, b = rng.sample(PARTIES, 2)
+    return rng.choice(CLAUSE_TEMPLATES).format(
+        a=a, b=b, n=rng.choice([7, 15, 30, 60, 90]),
+        city=rng.choice(CITIES), country=rng.choice(COUNTRIES)
+    )
+
+
+def generate_contract(n_clauses: int, seed: int = 0, clauses_per_section: int = 60,
+                      clauses_per_page: int = 40) -> str:
+    """
+    Build a contract with `n_clauses` numbered clauses (1.1, 1.2, ..., 2.1, ...).
+    Boilerplate repeats, as in real contracts; pages are separated by form feeds.
+    """
+    rng = random.Random(seed)
+    parts = ["MASTER SERVICES AGREEMENT\nThis Agreement is made between the Company and the Customer.\n"]
+    for i in range(n_clauses):
+        section, sub = divmod(i, clauses_per_section)
+        if sub == 0:
+            parts.append(f"{SECTION_HEADINGS[section % len(SECTION_HEADINGS)]}\n")
+        if i and i % clauses_per_page == 0:
+            parts.append("\f")
+        parts.append(f"{section + 1}.{sub + 1} {generate_clause(rng)}\n")
+    return "".join(parts)
+
+
+def write_contract(directory: str, n_clauses: int, seed: int = 0) -> str:
+    """Write a synthetic contract as a .txt file and return its path."""
+    path = os.path.join(directory, f"synthetic_{n_clauses}.txt")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(generate_contract(n_clauses, seed=seed))
+    return path
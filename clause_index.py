@@ -0,0 +1,355 @@
+"""
+Similar-clause search over Legal-BERT embeddings.
+
+Vectors live in a float16 file that is memory-mapped for reads, next to a
+parallel int64 file of results_store clause ids. Search is an exact
+vectorized cosine scan, or, once `build_ivf()` has run, an IVF-style
+search that only scans the `nprobe` partitions nearest to the query.
+
+    python clause_index.py build --db uploads/results.sqlite3 --index uploads/index
+    python clause_index.py ivf --index uploads/index --lists 1024
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+VECTORS_FILE = "vectors.f16"
+IDS_FILE = "ids.i64"
+META_FILE = "index.json"
+IVF_FILE = "ivf.npz"
+LOCK_FILE = "index.lock"
+
+# Rows scored per matrix product during exact scans
+SCAN_CHUNK = 65536
+# Below this many rows an exact scan is as fast as probing partitions
+IVF_MIN_ROWS = 50000
+
+
+# -----------------------------------------------------------
+# Top-k helpers
+# -----------------------------------------------------------
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> tuple:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], rows[order]
+
+
+def _merge(best: tuple, scores: np.ndarray, rows: np.ndarray, k: int) -> tuple:
+    if best is None:
+        return _top_k(scores, rows, k)
+    return _top_k(np.concatenate([best[0], scores]), np.concatenate([best[1], rows]), k)
+
+
+def spherical_kmeans(sample: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Unit-norm centroids for `sample` (rows already L2-normalized)."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.empty_like(centroids)
+        sums[filled] = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts[filled])
+        # Reseed empty partitions with random sample rows
+        sums[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+# -----------------------------------------------------------
+# Cross-process file lock
+# -----------------------------------------------------------
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock on `path` shared with other processes (gunicorn workers, the CLI)."""
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# -----------------------------------------------------------
+# The index
+# -----------------------------------------------------------
+class ClauseIndex:
+    """
+    Append-only float16 vector store with exact and IVF top-k cosine search.
+    Several instances (processes) may share one directory: appends hold a
+    file lock and start from the committed row count in index.json, and
+    readers pick up rows and IVF partitions written by the others.
+    """
+
+    def __init__(self, directory: str, dim: int = 768):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.dim, self.count = dim, 0
+        self._meta_stamp = None
+        self._ivf_stamp = None
+        self._vectors = None
+        self._ids = None
+        self._mapped = -1
+        self._ivf = None
+        self._refresh()
+
+    def __len__(self):
+        self._refresh()
+        return self.count
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh(self, force: bool = False):
+        """Re-read index.json and ivf.npz when another instance has rewritten them."""
+        stamp = self._stamp(self._path(META_FILE))
+        if stamp is not None and (force or stamp != self._meta_stamp):
+            with open(self._path(META_FILE), "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            self.dim, self.count = meta["dim"], meta["count"]
+            self._meta_stamp = stamp
+        stamp = self._stamp(self._path(IVF_FILE))
+        if stamp != self._ivf_stamp:
+            self._ivf = None
+            self._load_ivf()
+            self._ivf_stamp = stamp
+
+    def _write_meta(self):
+        tmp_path = self._path(META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"dim": self.dim, "count": self.count}, fh)
+        os.replace(tmp_path, self._path(META_FILE))
+
+    def _load_ivf(self):
+        path = self._path(IVF_FILE)
+        if os.path.exists(path):
+            data = np.load(path)
+            self._ivf = {key: data[key] for key in ("centroids", "rows", "offsets", "count")}
+
+    def _maps(self) -> tuple:
+        """(vectors, ids) memory maps covering the first `count` committed rows."""
+        self._refresh()
+        count = self.count
+        if self._mapped != count:
+            if count == 0:
+                self._vectors = np.zeros((0, self.dim), dtype=np.float16)
+                self._ids = np.zeros(0, dtype=np.int64)
+            else:
+                self._vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float16, mode="r",
+                                          shape=(count, self.dim))
+                self._ids = np.memmap(self._path(IDS_FILE), dtype=np.int64, mode="r", shape=(count,))
+            self._mapped = count
+        return self._vectors, self._ids
+
+    # -------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------
+    def add(self, clause_ids, vectors: np.ndarray):
+        """Append vectors (one row per clause id); rows are stored as float16."""
+        vectors = np.asarray(vectors, dtype=np.float16)
+        clause_ids = np.asarray(clause_ids, dtype=np.int64)
+        with self._lock, _locked(self._path(LOCK_FILE)):
+            # Another instance may have appended since we last looked
+            self._refresh(force=True)
+            if self.count == 0 and vectors.ndim == 2:
+                self.dim = vectors.shape[1]
+            if vectors.ndim != 2 or vectors.shape[1] != self.dim or len(vectors) != len(clause_ids):
+                raise ValueError(f"Expected ({len(clause_ids)}, {self.dim}) vectors, got {vectors.shape}")
+            # Truncate to the committed size first, dropping rows of an interrupted add
+            for name, array, width in ((VECTORS_FILE, vectors, self.dim * 2), (IDS_FILE, clause_ids, 8)):
+                with open(self._path(name), "ab") as fh:
+                    fh.truncate(self.count * width)
+                    fh.write(array.tobytes())
+            self.count += len(vectors)
+            self._write_meta()
+            self._meta_stamp = self._stamp(self._path(META_FILE))
+
+    def build_ivf(self, n_lists: int = None, iterations: int = 10, sample_size: int = None) -> int:
+        """
+        Partition the current rows with spherical k-means (default
+        ~2*sqrt(rows) lists, trained on a sample of 32 rows per list). Rows added later are scanned exactly until
+        the next build. Returns the number of lists.
+        """
+        vectors, _ = self._maps()
+        count = len(vectors)
+        if count == 0:
+            return 0
+        n_lists = min(n_lists or max(1, int(2 * np.sqrt(count))), count)
+        sample_size = min(count, sample_size or 32 * n_lists)
+        rng = np.random.default_rng(0)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, size=sample_size, replace=False))], dtype=np.float32)
+        centroids = spherical_kmeans(sample, n_lists, iterations)
+
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, SCAN_CHUNK):
+            chunk = np.asarray(vectors[start:start + SCAN_CHUNK], dtype=np.float32)
+            assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        rows = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+
+        with self._lock, _locked(self._path(LOCK_FILE)):
+            tmp_path = self._path(f"{IVF_FILE}.{os.getpid()}.tmp.npz")
+            np.savez(tmp_path, centroids=centroids, rows=rows, offsets=offsets, count=np.int64(count))
+            os.replace(tmp_path, self._path(IVF_FILE))
+            self._load_ivf()
+            self._ivf_stamp = self._stamp(self._path(IVF_FILE))
+        return n_lists
+
+    # -------------------------------------------------------
+    # Search
+    # -------------------------------------------------------
+    def _scan(self, vectors, query, start, stop, k, best):
+        for chunk_start in range(start, stop, SCAN_CHUNK):
+            chunk = np.asarray(vectors[chunk_start:min(chunk_start + SCAN_CHUNK, stop)], dtype=np.float32)
+            best = _merge(best, chunk @ query, np.arange(chunk_start, chunk_start + len(chunk)), k)
+        return best
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 16, exclude_ids=()) -> list:
+        """
+        Top-k rows by cosine similarity to `query` (a unit vector).
+        Returns [(clause_id, score), ...] best first.
+        """
+        vectors, ids = self._maps()
+        if len(vectors) == 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        want = k + len(exclude_ids)
+
+        ivf = self._ivf
+        best = None
+        if ivf is not None and int(ivf["count"]) >= IVF_MIN_ROWS and int(ivf["count"]) <= len(vectors):
+            indexed = int(ivf["count"])
+            probes = np.argsort(-(ivf["centroids"] @ query))[:nprobe]
+            candidates = np.sort(np.concatenate(
+                [ivf["rows"][ivf["offsets"][p]:ivf["offsets"][p + 1]] for p in probes]))
+            for start in range(0, len(candidates), SCAN_CHUNK):
+                rows = candidates[start:start + SCAN_CHUNK]
+                best = _merge(best, np.asarray(vectors[rows], dtype=np.float32) @ query, rows, want)
+            best = self._scan(vectors, query, indexed, len(vectors), want, best)
+        else:
+            best = self._scan(vectors, query, 0, len(vectors), want, best)
+
+        excluded = set(exclude_ids)
+        hits = [(int(ids[row]), float(score)) for score, row in zip(*best) if int(ids[row]) not in excluded]
+        return hits[:k]
+
+    def vector_for(self, clause_id: int):
+        """Stored vector of a clause (latest row), or None."""
+        vectors, ids = self._maps()
+        rows = np.flatnonzero(ids == clause_id)
+        return np.asarray(vectors[rows[-1]], dtype=np.float32) if len(rows) else None
+
+
+# -----------------------------------------------------------
+# Feeding the index from the results store
+# -----------------------------------------------------------
+def index_document(index: ClauseIndex, store, document_id: int, batch_size: int = 16) -> int:
+    """
+    Embed every clause of a stored document and append it to `index`.
+    Returns 0 without embedding when the active backend cannot embed.
+    """
+    from mod3_legalClause import embed_clauses, embeddings_available
+    if not embeddings_available():
+        return 0
+    rows = store.clause_texts(document_id=document_id)
+    if not rows:
+        return 0
+    index.add([r[0] for r in rows], embed_clauses([r[1] for r in rows], batch_size=batch_size))
+    return len(rows)
+
+
+def find_similar(index: ClauseIndex, store, text: str = None, clause_id: int = None,
+                 k: int = 10, nprobe: int = 16) -> list:
+    """
+    Clauses most similar to `text` or to a stored clause, as results_store
+    clause dicts with a "score". Clauses deleted from the store since they
+    were indexed are skipped. Searching by `text` raises
+    mod3_legalClause.EmbeddingUnavailable when the backend cannot embed.
+    """
+    if clause_id is not None:
+        query = index.vector_for(clause_id)
+        if query is None:
+            return []
+        exclude = (clause_id,)
+    else:
+        from mod3_legalClause import embed_clauses
+        query = embed_clauses([text])[0]
+        exclude = ()
+    # Over-fetch a little so stale ids do not shrink the answer
+    hits = index.search(query, k=k * 2, nprobe=nprobe, exclude_ids=exclude)
+    clauses = {c["id"]: c for c in store.get_clauses([clause for clause, _ in hits])}
+    return [{**clauses[clause], "score": round(score, 4)} for clause, score in hits if clause in clauses][:k]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build the similar-clause embedding index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="embed every clause in the results store (replaces the index)")
+    build.add_argument("--db", required=True)
+    build.add_argument("--index", required=True)
+    build.add_argument("--batch-size", type=int, default=64, help="clauses embedded per call")
+    ivf = sub.add_parser("ivf", help="partition the index for faster search")
+    ivf.add_argument("--index", required=True)
+    ivf.add_argument("--lists", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "ivf":
+        index = ClauseIndex(args.index)
+        print(f"{index.build_ivf(args.lists)} lists over {len(index)} rows")
+        return 0
+
+    from results_store import ResultsStore
+    from mod3_legalClause import embed_clauses
+    for name in (VECTORS_FILE, IDS_FILE, META_FILE, IVF_FILE):
+        if os.path.exists(os.path.join(args.index, name)):
+            os.remove(os.path.join(args.index, name))
+    store, index = ResultsStore(args.db), ClauseIndex(args.index)
+    cursor = 0
+    while True:
+        rows = store.clause_texts(after_id=cursor, limit=args.batch_size * 16)
+        if not rows:
+            break
+        for start in range(0, len(rows), args.batch_size):
+            chunk = rows[start:start + args.batch_size]
+            index.add([r[0] for r in chunk], embed_clauses([r[1] for r in chunk]))
+        cursor = rows[-1][0]
+        print(f"{len(index)} clauses embedded")
+    if len(index) >= IVF_MIN_ROWS:
+        print(f"{index.build_ivf()} IVF lists built")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
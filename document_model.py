@@ -0,0 +1,190 @@
+"""
+Annotated document model shared by the pipeline stages.
+
+A Document keeps the cleaned text of all its clauses in one buffer; clauses
+and sentences are (start, end) offsets into it. Work that every stage needs
+(sentence boundaries, the lowercased buffer, tokenizer ids) is computed once
+per document and cached as an annotation, so stages read and add
+annotations instead of re-deriving them from plain strings.
+"""
+import bisect
+
+# Separator between clauses in the buffer; a non-word character, so term
+# matching over the whole buffer never joins words across clauses
+CLAUSE_SEPARATOR = "\n"
+
+
+def strip_span(text: str, start: int, end: int) -> tuple:
+    """Shrink text[start:end] to exclude surrounding whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class Sentence:
+    __slots__ = ("document", "start", "end")
+
+    def __init__(self, document, start: int, end: int):
+        self.document = document
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return self.document.text[self.start:self.end]
+
+    def __repr__(self):
+        return f"Sentence({self.start}, {self.end}, {self.text[:40]!r})"
+
+
+class Clause:
+    """
+    One clause: offsets into the document buffer, its structural fields
+    (number, level, parent, page), sentences, entities and annotations.
+    The raw, pre-cleaning text is not kept; it lives in the processed dict.
+    """
+    __slots__ = ("document", "index", "start", "end", "number", "level", "parent", "page",
+                 "sentences", "entities", "annotations")
+
+    def __init__(self, document, index: int, start: int, end: int, number=None, level=None,
+                 parent=None, page=None, entities=None):
+        self.document = document
+        self.index = index
+        self.start = start
+        self.end = end
+        self.number = number
+        self.level = level
+        self.parent = parent
+        self.page = page
+        self.sentences = []
+        self.entities = entities or []
+        self.annotations = {}
+
+    @property
+    def text(self) -> str:
+        return self.document.text[self.start:self.end]
+
+    @property
+    def lower(self) -> str:
+        return self.document.lower[self.start:self.end]
+
+    def sentence_texts(self) -> list:
+        return [s.text for s in self.sentences]
+
+    def annotate(self, name: str, value):
+        self.annotations[name] = value
+        return value
+
+    def annotation(self, name: str, default=None):
+        return self.annotations.get(name, default)
+
+    def __repr__(self):
+        return f"Clause({self.index}, {self.number!r}, {self.text[:40]!r})"
+
+
+class Document:
+    """
+    Clauses of one document (or one chunk of it) over a single text buffer.
+    Build it with `Document.from_processed(preprocessed clause dicts)`.
+    """
+    __slots__ = ("text", "clauses", "annotations", "_lower", "_starts")
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.clauses = []
+        self.annotations = {}
+        self._lower = None
+        self._starts = None
+
+    @classmethod
+    def from_processed(cls, processed_clauses: list) -> "Document":
+        """
+        Build the model from mod2_preprocess clause dicts. Sentence offsets
+        come from their "sentence_spans"; dicts without them (e.g. from
+        preprocess_clause) have their "sentences" located in the text.
+        """
+        doc = cls()
+        parts, offset = [], 0
+        for i, c in enumerate(processed_clauses):
+            text = c.get("cleaned_text") or ""
+            clause = Clause(doc, i, offset, offset + len(text), number=c.get("number"),
+                            level=c.get("level"), parent=c.get("parent"), page=c.get("page"),
+                            entities=c.get("entities"))
+            spans = c.get("sentence_spans")
+            if spans is None:
+                spans = _locate(text, c.get("sentences") or [])
+            clause.sentences = [Sentence(doc, offset + s, offset + e) for s, e in spans]
+            doc.clauses.append(clause)
+            parts.append(text)
+            offset += len(text) + len(CLAUSE_SEPARATOR)
+        doc.text = CLAUSE_SEPARATOR.join(parts)
+        return doc
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def texts(self) -> list:
+        return [c.text for c in self.clauses]
+
+    @property
+    def lower(self) -> str:
+        """Lowercased buffer, computed once; always the same length as `text`."""
+        if self._lower is None:
+            lowered = self.text.lower()
+            if len(lowered) != len(self.text):
+                # Keep offsets valid: leave characters whose lowercase form changes length
+                lowered = "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in self.text)
+            self._lower = lowered
+        return self._lower
+
+    def sentence_texts(self) -> list:
+        """Sentences per clause, as lists of strings."""
+        return [c.sentence_texts() for c in self.clauses]
+
+    def token_ids(self, name: str, tokenize) -> list:
+        """
+        Token ids per clause for the tokenizer called `name`, computed with
+        one `tokenize(texts)` call on first use and cached on each clause.
+        """
+        key = f"{name}_ids"
+        if key not in self.annotations:
+            for clause, ids in zip(self.clauses, tokenize(self.texts())):
+                clause.annotate(key, ids)
+            self.annotations[key] = True
+        return [c.annotations[key] for c in self.clauses]
+
+    def clause_at(self, offset: int):
+        """The clause containing buffer `offset`, or None for a separator."""
+        if self._starts is None:
+            self._starts = [c.start for c in self.clauses]
+        k = bisect.bisect_right(self._starts, offset) - 1
+        if k < 0 or offset >= self.clauses[k].end:
+            return None
+        return self.clauses[k]
+
+    def split_spans(self, spans) -> list:
+        """
+        Group buffer-level (start, end, ...) spans by clause, with offsets
+        made relative to the clause. Returns one list per clause.
+        """
+        per_clause = [[] for _ in self.clauses]
+        for span in spans:
+            clause = self.clause_at(span[0])
+            if clause is None or span[1] > clause.end:
+                continue
+            per_clause[clause.index].append((span[0] - clause.start, span[1] - clause.start) + tuple(span[2:]))
+        return per_clause
+
+
+def _locate(text: str, sentences: list) -> list:
+    """Offsets of `sentences` found in order in `text`; unlocatable ones are dropped."""
+    spans, pos = [], 0
+    for sentence in sentences:
+        start = text.find(sentence, pos)
+        if start < 0:
+            continue
+        spans.append(strip_span(text, start, start + len(sentence)))
+        pos = start + len(sentence)
+    return spans
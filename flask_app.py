@@ -1,24 +1,99 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, send_file, session
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, send_from_directory, send_file, session, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 
 # Import existing modules
-from mod1_docingestion import extract_text
-from mod2_preprocess import preprocess_contract_text
-from mod3_legalClause import detect_clause_type
-from mod4_legalTermRec import recognize_legal_terms, legal_terms
-from mod5_LangSimple import simplify_text
-import json
+from mod1_docingestion import ExtractionError
+from pipeline import analyze_document, preprocess_document
+from revisions import analyze_revision, redline_summary
+from analysis_cache import DocumentCache, model_fingerprint
+from upload_store import UploadStore
+from jobs import JobManager
+from results_store import ResultsStore, MAX_PAGE_SIZE
+from clause_index import ClauseIndex, index_document, find_similar
+from mod3_legalClause import EmbeddingUnavailable, embeddings_available
+from concurrent.futures import ThreadPoolExecutor
+from metrics import tracing, registry as metrics_registry
+import model_registry
+import inference_scheduler
 import io
+import json
+import sqlite3
+import threading
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
+# Results database, clause index and caches: never under UPLOAD_FOLDER, which /uploads serves
+DATA_FOLDER = os.path.join(os.path.dirname(__file__), 'data')
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
 
+class InMemoryUploadRequest(Request):
+    """
+    Parses multipart file parts into memory instead of werkzeug's spooled
+    temp files (which go to disk above 500 KB), so an upload is read from
+    the request body exactly once. MAX_CONTENT_LENGTH bounds the memory used.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['UPLOAD_STORE_DIR'] = os.path.join(UPLOAD_FOLDER, 'documents')  # uploads stored by SHA-256
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024  # uploads are held in memory while analyzed
+app.config['SIMPLIFY_PROFILE'] = 'quality'  # 'fast' (greedy) or 'quality' (beam search)
+app.config['ANALYSIS_CACHE_DIR'] = os.path.join(DATA_FOLDER, 'cache', 'analysis')
+app.config['ANALYSIS_CACHE_MAX_DOCUMENTS'] = 256
+app.config['MICROBATCH'] = inference_scheduler.ENABLED  # merge model calls of concurrent requests
+app.config['JOB_WORKERS'] = 2  # size of the analysis process pool
+app.config['JOB_MAX_PENDING'] = 16  # uploads allowed to queue before we answer 503
+app.config['RESULTS_DB'] = os.path.join(DATA_FOLDER, 'results.sqlite3')
+app.config['CLAUSE_INDEX_DIR'] = os.path.join(DATA_FOLDER, 'index')
+app.config['INDEX_ON_SAVE'] = True  # embed clauses of every stored analysis for /api/similar
+app.config['REPORT_CACHE_DIR'] = os.path.join(DATA_FOLDER, 'cache', 'reports')
+app.config['REPORT_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+app.config['RESULTS_PAGE_SIZE'] = 50  # clauses per dashboard page; more load as the user scrolls
+app.config['TRACE_RESULTS'] = False  # always embed a per-request timing trace in results JSON
 app.secret_key = 'dev-secret-for-demo'  # Required for session management
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(DATA_FOLDER, exist_ok=True)
+
+# Load the models listed in CLAUSEEASE_PRELOAD_MODELS now (no-op when empty).
+# With `gunicorn --preload` this runs once in the master and forked workers
+# share the weights copy-on-write; everything else loads lazily on first use.
+model_registry.preload()
+
+# Concurrent dashboard requests share batched model calls (threaded server only;
+# job workers are separate processes and batch per document)
+if app.config['MICROBATCH']:
+    inference_scheduler.enable()
+
+# Uploaded documents, stored once per distinct content
+upload_store = UploadStore(app.config['UPLOAD_STORE_DIR'])
+
+# Whole-document results cache: SHA-256 of the upload + model fingerprint -> results
+document_cache = DocumentCache(app.config['ANALYSIS_CACHE_DIR'],
+                               max_entries=app.config['ANALYSIS_CACHE_MAX_DOCUMENTS'])
+
+# Queryable store of every analysis (documents, clauses, types, terms, entities)
+results_store = ResultsStore(app.config['RESULTS_DB'])
+
+# Clause embeddings for /api/similar, appended by one background thread
+clause_index = ClauseIndex(app.config['CLAUSE_INDEX_DIR'])
+index_executor = ThreadPoolExecutor(max_workers=1)
+
+# Generated PDF reports for /download_results (None when reportlab is missing)
+try:
+    from report_pdf import ReportCache
+    report_cache = ReportCache(app.config['REPORT_CACHE_DIR'], max_bytes=app.config['REPORT_CACHE_MAX_BYTES'])
+except ImportError:
+    report_cache = None
+
+# Background analysis jobs for /api/jobs
+job_manager = JobManager(max_workers=app.config['JOB_WORKERS'],
+                         max_pending=app.config['JOB_MAX_PENDING'])
 
 # Simple in-memory user store for demo purposes
 USERS = {
@@ -41,6 +116,78 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def trace_requested():
+    return app.config['TRACE_RESULTS'] or request.values.get('trace') in ('1', 'true', 'on')
+
+
+def receive_upload(file):
+    """
+    Hash and store an upload; the returned Upload keeps its bytes for
+    extraction. `file.stream` is the in-memory buffer InMemoryUploadRequest
+    parsed the body into, so nothing is read back from disk.
+    """
+    return upload_store.ingest(file.stream, secure_filename(file.filename))
+
+
+def upload_url_path(path):
+    """Path of a stored upload relative to UPLOAD_FOLDER, for the uploaded_file route."""
+    return os.path.relpath(path, app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+
+
+def save_results_json(save_path, results, trace=None):
+    """
+    Persist results next to the uploaded file so /download_results can find them.
+    With a trace the file holds {"results": [...], "trace": {...}} instead of the bare list.
+    """
+    json_path = save_path + '.results.json'
+    # Identical concurrent uploads share this path: write a private file and swap it in
+    tmp_path = f"{json_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        payload = results if trace is None else {'results': results, 'trace': trace}
+        with open(tmp_path, 'w', encoding='utf-8') as jf:
+            json.dump(payload, jf, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, json_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        app.logger.warning(f"Could not save results JSON: {e}")
+
+
+def load_results_json(json_path):
+    """Read a results JSON file written by save_results_json (with or without a trace)."""
+    with open(json_path, 'r', encoding='utf-8') as jf:
+        data = json.load(jf)
+    return data['results'] if isinstance(data, dict) else data
+
+
+def indexing_enabled():
+    """
+    Whether stored analyses are embedded for /api/similar. Analyses run with
+    `embed=indexing_enabled()` pool those embeddings during classification,
+    so indexing does not encode the clauses a second time.
+    """
+    # The ONNX backend has no embedding output; such documents are simply not indexed
+    return app.config['INDEX_ON_SAVE'] and embeddings_available()
+
+
+def store_results(doc_hash, filename, results, fingerprint, uploaded_by=None):
+    """
+    Save an analysis to the results store and queue its clauses for the
+    embedding index. A document already stored with the same models is left
+    as is, so repeat uploads are not embedded twice.
+    """
+    existing = results_store.find_document(sha256=doc_hash)
+    if existing and existing['fingerprint'] == fingerprint and existing['clause_count'] == len(results):
+        return existing['id']
+    document_id = results_store.save_document(doc_hash, filename, results, fingerprint=fingerprint,
+                                              uploaded_by=uploaded_by)
+    if indexing_enabled():
+        future = index_executor.submit(index_document, clause_index, results_store, document_id)
+        future.add_done_callback(lambda f: f.exception() and app.logger.warning(
+            f"Could not index document {doc_hash}: {f.exception()}"))
+    return document_id
+
+
 @app.route('/')
 def index():
     return render_template('login.html')
@@ -106,6 +253,11 @@ def logout():
 @app.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
+    """
+    Upload and analyze a document, or view a stored one with ?document=<sha256>.
+    Only the first page of clauses is rendered; the page script loads the
+    rest from /api/documents/<sha256>/clauses as the user scrolls.
+    """
     uploaded_file_info = None
     results = None
     logo_filename = None
@@ -130,131 +282,292 @@ def dashboard():
             flash('No selected file')
             return redirect(request.url)
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(save_path)
-            uploaded_file_info = {'name': filename, 'path': save_path}
-
-            # Run pipeline: extract -> preprocess -> detect -> terms -> simplify
-            contract_text = extract_text(save_path)
-            if contract_text.startswith('[ERROR]'):
-                flash(contract_text)
-                return redirect(request.url)
-
-            processed_clauses = preprocess_contract_text(contract_text)
-            clause_types = [detect_clause_type(c['cleaned_text']) for c in processed_clauses]
-            clause_terms = [recognize_legal_terms(c['cleaned_text'], legal_terms) for c in processed_clauses]
-            simplified = [simplify_text(c['cleaned_text']) for c in processed_clauses]
-
-            results = []
-            for i, c in enumerate(processed_clauses):
-                results.append({
-                    'index': i+1,
-                    'raw': c['raw_text'],
-                    'cleaned': c['cleaned_text'],
-                    'type': clause_types[i],
-                    'terms': clause_terms[i],
-                    'simple': simplified[i]
-                })
-            # persist results to a JSON file next to the uploaded file so we can
+            upload = receive_upload(file)
+            filename, doc_hash = upload.filename, upload.sha256
+            uploaded_file_info = {'name': filename, 'sha256': doc_hash, 'path': upload_url_path(upload.path)}
+
+            with tracing() as trace:
+                # Repeat uploads of the same bytes come straight from the document cache
+                profile = app.config['SIMPLIFY_PROFILE']
+                fingerprint = model_fingerprint(profile)
+                results = document_cache.get(doc_hash, fingerprint)
+
+                if results is None:
+                    # Run pipeline: extract -> preprocess -> detect -> terms -> simplify
+                    try:
+                        results = analyze_document(upload.path, profile=profile, data=upload.data,
+                                                   embed=indexing_enabled())
+                    except ExtractionError as e:
+                        flash(f'[ERROR] {e}')
+                        return redirect(request.url)
+                    except inference_scheduler.SchedulerFull as e:
+                        flash(str(e))
+                        return redirect(request.url)
+                    document_cache.put(doc_hash, fingerprint, results)
+                store_results(doc_hash, filename, results, fingerprint, uploaded_by=session.get('user_email'))
+
+            # persist results to a JSON file next to the stored upload so we can
             # generate PDFs later or serve them for download
-            try:
-                json_path = save_path + '.results.json'
-                with open(json_path, 'w', encoding='utf-8') as jf:
-                    json.dump(results, jf, ensure_ascii=False, indent=2)
-            except Exception as e:
-                app.logger.warning(f"Could not save results JSON: {e}")
-    return render_template('dashboard.html', uploaded=uploaded_file_info, results=results, logo_filename=logo_filename)
+            save_results_json(upload.path, results, trace=trace.to_dict() if trace_requested() else None)
+    elif request.args.get('document'):
+        stored = results_store.find_document(sha256=request.args['document'])
+        if stored is not None:
+            upload_path = upload_store.find(stored['sha256'])
+            uploaded_file_info = {'name': stored['filename'], 'sha256': stored['sha256'],
+                                  'path': upload_url_path(upload_path) if upload_path else None}
+
+    page = {'items': None, 'next_cursor': None}
+    if uploaded_file_info is not None:
+        page = results_store.document_clauses(uploaded_file_info['sha256'], limit=app.config['RESULTS_PAGE_SIZE'])
+    return render_template('dashboard.html', uploaded=uploaded_file_info, results=page['items'],
+                           next_cursor=page['next_cursor'], clause_types=results_store.clause_types(),
+                           page_size=app.config['RESULTS_PAGE_SIZE'], logo_filename=logo_filename)
+
+
+# ---------------- ASYNC ANALYSIS JOBS ----------------
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    """Accept an upload and return a job id at once; analysis runs in the process pool."""
+    file = request.files.get('document')
+    if not file or file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': 'Please upload a PDF, DOCX or TXT document.'}), 400
+
+    upload = receive_upload(file)
+    filename, doc_hash = upload.filename, upload.sha256
+    profile = app.config['SIMPLIFY_PROFILE']
+    fingerprint = model_fingerprint(profile)
+
+    with_trace = trace_requested()
+    user = session.get('user_email')
+    try:
+        results = document_cache.get(doc_hash, fingerprint)
+        if results is not None:
+            save_results_json(upload.path, results)
+            store_results(doc_hash, filename, results, fingerprint, uploaded_by=user)
+            # Already analyzed: the client pages through clauses_url instead of one event per clause
+            job = job_manager.completed(filename, results, stream_clauses=False)
+        else:
+            def on_complete(job_results, trace):
+                document_cache.put(doc_hash, fingerprint, job_results)
+                store_results(doc_hash, filename, job_results, fingerprint, uploaded_by=user)
+                save_results_json(upload.path, job_results, trace=trace if with_trace else None)
+
+            job = job_manager.submit(filename, upload.path, profile=profile, on_complete=on_complete,
+                                     data=upload.data, embed=indexing_enabled())
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'events_url': url_for('job_events', job_id=job.id),
+        'download_url': url_for('download_results', document=doc_hash, filename=filename),
+        'clauses_url': url_for('document_clauses', sha256=doc_hash),
+    }), 202
+
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>/events')
+@login_required
+def job_events(job_id):
+    """Server-Sent Events: progress updates and each clause result as soon as it is ready."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def stream():
+        cursor = 0
+        while True:
+            events = job.wait_for_events(cursor)
+            if not events:
+                if job.finished:
+                    break
+                yield ': keep-alive\n\n'
+                continue
+            for kind, payload in events:
+                yield f"event: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            cursor += len(events)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ---------------- CONTRACT REVISIONS ----------------
+@app.route('/api/revisions', methods=['POST'])
+@login_required
+def create_revision():
+    """
+    Analyze an upload as a revision of an earlier document (form field
+    `previous`: its SHA-256 or filename). Only inserted and modified clauses
+    are re-analyzed; the response carries the clause-level redline.
+    """
+    file = request.files.get('document')
+    if not file or file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': 'Please upload a PDF, DOCX or TXT document.'}), 400
+    previous_ref = request.form.get('previous', '')
+    previous = (results_store.find_document(sha256=previous_ref)
+                or results_store.find_document(filename=secure_filename(previous_ref)))
+    if previous is None:
+        return jsonify({'error': 'Unknown previous version.'}), 404
+
+    upload = receive_upload(file)
+    filename, doc_hash = upload.filename, upload.sha256
+    profile = app.config['SIMPLIFY_PROFILE']
+    fingerprint = model_fingerprint(profile)
+    with tracing() as trace:
+        try:
+            processed_clauses = preprocess_document(upload.path, data=upload.data)
+        except ExtractionError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            # Stored results from other models cannot be reused, only diffed
+            results, redline = analyze_revision(results_store.load_results(previous['sha256']), processed_clauses,
+                                                profile=profile, reuse=previous['fingerprint'] == fingerprint,
+                                                embed=indexing_enabled())
+        except inference_scheduler.SchedulerFull as e:
+            return jsonify({'error': str(e)}), 503
+
+    summary = redline_summary(redline)
+    document_cache.put(doc_hash, fingerprint, results)
+    store_results(doc_hash, filename, results, fingerprint, uploaded_by=session.get('user_email'))
+    results_store.link_revision(doc_hash, previous['sha256'], summary)
+    save_results_json(upload.path, results, trace=trace.to_dict() if trace_requested() else None)
+
+    return jsonify({
+        'document': doc_hash,
+        'previous': previous['sha256'],
+        'summary': summary,
+        'redline': redline,
+        'download_url': url_for('download_results', document=doc_hash, filename=filename),
+    })
+
+
+# ---------------- RESULTS QUERIES ----------------
+def _page_args():
+    """Filters and paging shared by the query endpoints."""
+    return {
+        'clause_type': request.args.get('type') or None,
+        'term': request.args.get('term') or None,
+        'q': request.args.get('q') or None,
+        'cursor': request.args.get('cursor', 0, type=int),
+        'limit': request.args.get('limit', 50, type=int),
+    }
+
+
+@app.route('/api/clauses')
+@login_required
+def query_clauses():
+    """Clauses across all analyzed documents, filtered by ?type=, ?term=, ?q= (full text) and ?document=."""
+    try:
+        page = results_store.query_clauses(document=request.args.get('document') or None, **_page_args())
+    except sqlite3.OperationalError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    return jsonify(page)
+
+
+@app.route('/api/documents')
+@login_required
+def query_documents():
+    """Documents with at least one clause matching ?type=, ?term= and ?q=."""
+    try:
+        page = results_store.query_documents(**_page_args())
+    except sqlite3.OperationalError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    return jsonify(page)
+
+
+@app.route('/api/documents/<sha256>/clauses')
+@login_required
+def document_clauses(sha256):
+    """
+    One stored analysis a page at a time, in clause order: ?type=, ?term=,
+    ?cursor= (the previous page's next_cursor) and ?limit=. The page is
+    streamed while it is read from the store, so the first clause goes out
+    before the last one is fetched, whatever the document's size.
+    """
+    if results_store.find_document(sha256=sha256) is None:
+        return jsonify({'error': 'Unknown document'}), 404
+    args = _page_args()
+    limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+    rows = results_store.iter_document_clauses(sha256, args['clause_type'], args['term'], args['cursor'], limit + 1)
+
+    def stream():
+        yield '{"document": %s, "items": [' % json.dumps(sha256)
+        count, last, more = 0, None, False
+        for item in rows:
+            if count == limit:
+                more = True  # the extra row only tells us another page exists
+                break
+            yield (',' if count else '') + json.dumps(item, ensure_ascii=False)
+            count += 1
+            last = item['index']
+        yield '], "next_cursor": %s}' % json.dumps(last if more else None)
+
+    return Response(stream_with_context(stream()), mimetype='application/json')
+
+
+@app.route('/api/similar')
+@login_required
+def similar_clauses():
+    """Clauses across the corpus most similar to ?text= or to stored clause ?clause=<id>."""
+    text = request.args.get('text', '').strip()
+    clause_id = request.args.get('clause', type=int)
+    if not text and clause_id is None:
+        return jsonify({'error': 'Pass text= or clause='}), 400
+    k = max(1, min(request.args.get('k', 10, type=int), 100))
+    try:
+        items = find_similar(clause_index, results_store, text=text or None, clause_id=clause_id, k=k,
+                             nprobe=request.args.get('nprobe', 16, type=int))
+    except EmbeddingUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'items': items, 'indexed': len(clause_index)})
 
 
 @app.route('/download_results')
 def download_results():
-    filename = request.args.get('filename')
-    if not filename:
-        flash('No filename provided for download')
+    doc_hash = request.args.get('document')
+    filename = secure_filename(request.args.get('filename', ''))
+    if not doc_hash and not filename:
+        flash('No document provided for download')
         return redirect(url_for('dashboard'))
-
-    # expect a results json saved as <uploaded_filename>.results.json
-    json_path = os.path.join(app.config['UPLOAD_FOLDER'], filename + '.results.json')
-    if not os.path.exists(json_path):
+    if not doc_hash:
+        # Links by filename resolve to that file's latest analysis
+        stored = results_store.find_document(filename=filename)
+        doc_hash = stored['sha256'] if stored else None
+    elif not filename:
+        stored = results_store.find_document(sha256=doc_hash)
+        filename = stored['filename'] if stored else doc_hash[:12]
+
+    # expect a results json saved next to the stored upload as <upload>.results.json
+    upload_path = upload_store.find(doc_hash)
+    json_path = upload_path + '.results.json' if upload_path else None
+    if json_path is None or not os.path.exists(json_path):
         flash('No results available to download for this file.')
         return redirect(url_for('dashboard'))
 
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-    except Exception:
+    if report_cache is None:
         flash('PDF generation requires the reportlab package. Install with: pip install reportlab')
         return redirect(url_for('dashboard'))
 
-    # load results
-    with open(json_path, 'r', encoding='utf-8') as jf:
-        results = json.load(jf)
-
-    # generate PDF in-memory
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    margin = 72
-    y = height - margin
-
-    # header
-    c.setFont('Helvetica-Bold', 16)
-    c.drawString(margin, y, f'Analysis Results — {filename}')
-    y -= 24
-    c.setFont('Helvetica', 10)
-
-    def write_wrapped(text, indent=0, max_width=80):
-        nonlocal y
-        import textwrap
-        lines = textwrap.wrap(text, max_width)
-        for ln in lines:
-            if y < margin + 40:
-                c.showPage()
-                y = height - margin
-                c.setFont('Helvetica', 10)
-            c.drawString(margin + indent, y, ln)
-            y -= 12
-
-    for r in results:
-        if y < margin + 80:
-            c.showPage()
-            y = height - margin
-            c.setFont('Helvetica', 10)
-
-        c.setFont('Helvetica-Bold', 12)
-        c.drawString(margin, y, f"Clause {r.get('index')} — {r.get('type')}")
-        y -= 14
-        c.setFont('Helvetica', 10)
-        write_wrapped(r.get('cleaned', ''), indent=8, max_width=90)
-        y -= 6
-        # terms
-        terms = r.get('terms') or {}
-        if terms:
-            c.setFont('Helvetica-Bold', 10)
-            c.drawString(margin + 8, y, 'Terms:')
-            y -= 12
-            c.setFont('Helvetica', 9)
-            for t, info in terms.items():
-                definition = info.get('definition') if isinstance(info, dict) else info
-                method = info.get('method') if isinstance(info, dict) else ''
-                write_wrapped(f"- {t}: {definition} ({method})", indent=16, max_width=86)
-                y -= 4
-        else:
-            c.drawString(margin + 8, y, 'Terms: None')
-            y -= 14
+    # Rendered once per results file and layout version, then served from disk
+    pdf_path = report_cache.get_or_build(json_path, filename, load_results_json)
+    return send_file(pdf_path, as_attachment=True, download_name=f"{filename}_analysis.pdf",
+                     mimetype='application/pdf', conditional=True)
 
-        # simplified
-        c.setFont('Helvetica-Bold', 10)
-        c.drawString(margin + 8, y, 'Simplified:')
-        y -= 12
-        c.setFont('Helvetica', 10)
-        write_wrapped(r.get('simple', ''), indent=16, max_width=86)
-        y -= 12
 
-    c.save()
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name=f"{filename}_analysis.pdf", mimetype='application/pdf')
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: pipeline counters and per-stage latency histograms."""
+    return Response(metrics_registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/uploads/<path:filename>')
@@ -263,4 +576,5 @@ def uploaded_file(filename):
 
 
 if __name__ == '__main__':
+    model_registry.warmup()
     app.run(port=3000, debug=True)
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""
+Cross-request micro-batching for the model stages.
+
+Request threads hand their clause-classification and sentence-generation
+work to one scheduler thread per model. The scheduler merges requests that
+arrive together into a single call (up to a token budget, waiting at most
+a few milliseconds for company), runs it, and hands each caller its slice
+of the output. When nobody else is submitting, a request runs at once, so
+a lone user pays no batching delay. A full queue raises SchedulerFull.
+
+Enable it in a threaded server with `enable()` (or CLAUSEEASE_MICROBATCH=1
+via flask_app); it only batches across threads of one process.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import mod3_legalClause
+import mod5_LangSimple
+from metrics import increment
+
+# Requests merged into one model call are capped at roughly this many tokens
+MAX_BATCH_TOKENS = int(os.environ.get("CLAUSEEASE_MICROBATCH_TOKENS", "8192"))
+# Longest time the scheduler holds a request waiting for others to join it
+MAX_WAIT_MS = float(os.environ.get("CLAUSEEASE_MICROBATCH_WAIT_MS", "5"))
+# Requests allowed to queue per model before callers are turned away
+MAX_QUEUE = int(os.environ.get("CLAUSEEASE_MICROBATCH_QUEUE", "256"))
+# How long a caller waits for queue space before SchedulerFull is raised
+SUBMIT_TIMEOUT = 1.0
+
+ENABLED = os.environ.get("CLAUSEEASE_MICROBATCH", "") not in ("", "0", "false")
+
+
+class SchedulerFull(RuntimeError):
+    """Raised when the scheduler queue stays full for SUBMIT_TIMEOUT seconds."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token) for budgeting."""
+    return len(text) // 4 + 1
+
+
+class _Request:
+    __slots__ = ("items", "kwargs", "key", "cost", "done", "result", "error")
+
+    def __init__(self, items, kwargs):
+        self.items = items
+        self.kwargs = kwargs
+        self.key = tuple(sorted(kwargs.items()))
+        self.cost = sum(estimate_tokens(t) for t in items)
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# -----------------------------------------------------------
+# Scheduler
+# -----------------------------------------------------------
+class MicroBatcher:
+    """
+    Runs `fn(items, **kwargs) -> list` on merged requests from many threads.
+    Only requests with identical kwargs are merged; `fn` must return one
+    output per input item, in order.
+    """
+
+    def __init__(self, fn, name: str, max_batch_tokens: int = MAX_BATCH_TOKENS,
+                 max_wait_ms: float = MAX_WAIT_MS, max_queue: int = MAX_QUEUE,
+                 submit_timeout: float = SUBMIT_TIMEOUT):
+        self.fn = fn
+        self.name = name
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait_ms / 1000.0
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._held = deque()  # requests taken off the queue but not yet batched
+        self._active = 0      # callers between submit() entry and their result
+        self._active_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"microbatch-{self.name}", daemon=True)
+                self._thread.start()
+
+    def submit(self, items: list, **kwargs) -> list:
+        """Queue `items`, block until their batch has run, and return their outputs."""
+        if not items:
+            return []
+        if self._thread is None:
+            self._start()
+        request = _Request(list(items), kwargs)
+        with self._active_lock:
+            self._active += 1
+        try:
+            try:
+                self._queue.put(request, timeout=self.submit_timeout)
+            except queue.Full:
+                raise SchedulerFull(f"The {self.name} scheduler is at capacity, please retry shortly.") from None
+            request.done.wait()
+        finally:
+            with self._active_lock:
+                self._active -= 1
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _others_coming(self, batched: int) -> bool:
+        """True while some caller has submitted work that is not in the current batch yet."""
+        return self._active - batched - len(self._held) > 0 or not self._queue.empty()
+
+    def _collect(self) -> list:
+        first = self._held.popleft() if self._held else self._queue.get()
+        batch, tokens = [first], first.cost
+
+        # Held requests with the same settings join first, in arrival order
+        for request in list(self._held):
+            if request.key == first.key and tokens + request.cost <= self.max_batch_tokens:
+                self._held.remove(request)
+                batch.append(request)
+                tokens += request.cost
+
+        deadline = time.monotonic() + self.max_wait
+        while tokens < self.max_batch_tokens and self._others_coming(len(batch)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request.key != first.key or tokens + request.cost > self.max_batch_tokens:
+                self._held.append(request)
+                if request.key == first.key:
+                    break  # budget reached
+                continue
+            batch.append(request)
+            tokens += request.cost
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            items = [item for request in batch for item in request.items]
+            try:
+                outputs = self.fn(items, **batch[0].kwargs)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            increment("clauseease_microbatches_total")
+            increment("clauseease_microbatch_requests_total", len(batch))
+            start = 0
+            for request in batch:
+                request.result = outputs[start:start + len(request.items)]
+                start += len(request.items)
+                request.done.set()
+
+
+# -----------------------------------------------------------
+# Model stages
+# -----------------------------------------------------------
+classifier = None
+generator = None
+
+
+def enable(max_batch_tokens: int = MAX_BATCH_TOKENS, max_wait_ms: float = MAX_WAIT_MS,
+           max_queue: int = MAX_QUEUE):
+    """Route classification and T5 generation through shared micro-batchers."""
+    global classifier, generator, ENABLED
+    classifier = MicroBatcher(mod3_legalClause.detect_clause_types, "classify",
+                              max_batch_tokens, max_wait_ms, max_queue)
+    generator = MicroBatcher(mod5_LangSimple.generate_simplifications, "generate",
+                             max_batch_tokens, max_wait_ms, max_queue)
+    mod5_LangSimple.set_generation_engine(generator.submit)
+    ENABLED = True
+
+
+def classify(texts: list, document=None, embed: bool = False) -> list:
+    """
+    mod3_legalClause.detect_clause_types, through the scheduler when enabled.
+    Called directly, it reuses the Legal-BERT token ids cached on
+    `document` (a document_model.Document over `texts`); the scheduler
+    tokenizes each merged batch once itself. `embed` also pools the
+    clauses' embeddings for indexing from the same pass.
+    """
+    if classifier is None:
+        encodings = None
+        if document is not None:
+            encodings = document.token_ids("legal_bert", mod3_legalClause.tokenize_clauses)
+        return mod3_legalClause.detect_clause_types(texts, encodings=encodings, embed=embed)
+    return classifier.submit(texts, embed=embed)
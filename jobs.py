@@ -0,0 +1,225 @@
+import os
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pipeline import STAGES, preprocess_document, iter_analyze_clauses
+from mod3_legalClause import cached_embeddings, remember_embeddings
+from metrics import tracing, merge_trace
+
+# How job workers are started. "spawn" gives each worker a fresh interpreter,
+# so it never inherits the web process's model weights, locks or threads
+# the way a fork would.
+JOB_START_METHOD = os.environ.get("CLAUSEEASE_JOB_START_METHOD", "spawn")
+
+
+# -----------------------------------------------------------
+# Worker side (runs inside the process pool)
+# -----------------------------------------------------------
+def run_analysis_job(job_id: str, file_path: str, profile: str, events, data=None, embed=False) -> dict:
+    """
+    Run extract -> preprocess -> detect -> terms -> simplify for one upload
+    (from `data` when the web process passed its bytes along),
+    pushing ("progress", ...) and ("clause", ...) events onto `events`.
+    Returns {"results": [...], "trace": {...}, "embeddings": [...]}; the
+    trace carries this worker's stage timings back to the web process.
+    With `embed`, "embeddings" holds the clause embeddings pooled during
+    classification (None where a clause was not classified), so the web
+    process can index them without encoding the clauses again.
+    Raises ExtractionError when the document cannot be extracted.
+    """
+    def progress(stage, done, total):
+        events.put((job_id, "progress", {"stage": stage, "done": done, "total": total}))
+
+    with tracing() as trace:
+        processed_clauses = preprocess_document(file_path, progress=progress, data=data)
+
+        results = []
+        for result in iter_analyze_clauses(processed_clauses, profile=profile, progress=progress, embed=embed):
+            results.append(result)
+            events.put((job_id, "clause", result))
+    embeddings = cached_embeddings([r["cleaned"] for r in results]) if embed else None
+    return {"results": results, "trace": trace.to_dict(), "embeddings": embeddings}
+
+
+# -----------------------------------------------------------
+# Job bookkeeping (web process)
+# -----------------------------------------------------------
+class Job:
+    """State of one analysis job; `events` is the ordered stream sent over SSE."""
+
+    def __init__(self, job_id: str, filename: str):
+        self.id = job_id
+        self.filename = filename
+        self.status = "queued"
+        self.error = None
+        self.stages = {stage: {"done": 0, "total": 0} for stage in STAGES}
+        self.results = []
+        self.trace = None
+        self.events = []
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def publish(self, kind: str, payload):
+        with self.changed:
+            if kind == "progress":
+                self.status = "running"
+                self.stages[payload["stage"]] = {"done": payload["done"], "total": payload["total"]}
+            elif kind == "clause":
+                self.results.append(payload)
+            elif kind == "done":
+                self.status = "done"
+                self.trace = payload
+            elif kind == "error":
+                self.status = "error"
+                self.error = payload
+            self.events.append((kind, payload))
+            self.changed.notify_all()
+
+    def wait_for_events(self, cursor: int, timeout: float = 15.0) -> list:
+        """Return events after `cursor`, blocking up to `timeout` seconds for new ones."""
+        with self.changed:
+            if cursor >= len(self.events) and not self.finished:
+                self.changed.wait(timeout)
+            return self.events[cursor:]
+
+    def to_dict(self) -> dict:
+        with self.changed:
+            return {
+                "job_id": self.id,
+                "filename": self.filename,
+                "status": self.status,
+                "error": self.error,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "clauses_ready": len(self.results),
+                "trace": self.trace,
+            }
+
+
+class JobManager:
+    """
+    Runs analysis jobs on a bounded local process pool. Workers report
+    progress through a multiprocessing manager queue, which a listener thread
+    fans out to the matching Job. At most `max_pending` jobs may be queued or
+    running; `submit` raises RuntimeError beyond that. Workers are started
+    with JOB_START_METHOD and load the models themselves on first use. A
+    pool broken by a crashed worker is replaced with a fresh one.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, max_jobs: int = 200):
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._context = None
+        self._events = None
+        self._max_workers = max_workers
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        # Started lazily so importing the web app does not spawn processes
+        with self._start_lock:
+            if self._executor is None:
+                self._context = multiprocessing.get_context(JOB_START_METHOD)
+                self._events = self._context.Manager().Queue()
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=self._context)
+                threading.Thread(target=self._listen, name="job-events", daemon=True).start()
+            return self._executor
+
+    def _replace_broken(self, executor):
+        """Swap in a new pool if `executor` (broken by a dead worker) is still the current one."""
+        with self._start_lock:
+            if self._executor is executor:
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=self._context)
+            executor.shutdown(wait=False)
+            return self._executor
+
+    def _listen(self):
+        for job_id, kind, payload in iter(self._events.get, None):
+            job = self.get(job_id)
+            if job is not None:
+                job.publish(kind, payload)
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _register(self, filename: str) -> Job:
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.finished)
+            if pending >= self.max_pending:
+                raise RuntimeError("Too many analysis jobs in progress, please retry shortly.")
+            job = Job(uuid.uuid4().hex, filename)
+            self._jobs[job.id] = job
+            # forget the oldest finished jobs once over the retention limit
+            for old_id in [k for k, j in self._jobs.items() if j.finished][:max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[old_id]
+            return job
+
+    def completed(self, filename: str, results: list, stream_clauses: bool = True) -> Job:
+        """
+        Register a job whose results are already known (e.g. a cache hit).
+        With `stream_clauses=False` only progress and "done" are published;
+        the client fetches the clauses itself.
+        """
+        job = self._register(filename)
+        for stage in STAGES:
+            job.publish("progress", {"stage": stage, "done": len(results), "total": len(results)})
+        if stream_clauses:
+            for result in results:
+                job.publish("clause", result)
+        else:
+            with job.changed:
+                job.results.extend(results)
+        job.publish("done", None)
+        return job
+
+    def submit(self, filename: str, file_path: str, profile: str = "quality", on_complete=None,
+               data=None, embed=False) -> Job:
+        """
+        Queue an analysis of `file_path`, or of its bytes `data` when given
+        (the worker then never reads the file). `on_complete(results, trace)`
+        runs in the web process once the worker finishes, before the job is
+        marked done. With `embed`, the embeddings the worker pooled are added
+        to this process's embedding cache before `on_complete` runs.
+        """
+        job = self._register(filename)
+        executor = self._start()
+        try:
+            try:
+                future = executor.submit(run_analysis_job, job.id, file_path, profile, self._events, data, embed)
+            except BrokenProcessPool:
+                executor = self._replace_broken(executor)
+                future = executor.submit(run_analysis_job, job.id, file_path, profile, self._events, data, embed)
+        except Exception:
+            # Never left "queued", where it would count against max_pending forever
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+
+        def finish(fut):
+            # Sent through the same queue as the worker's events, so "done"
+            # always arrives after the last clause.
+            try:
+                outcome = fut.result()
+                merge_trace(outcome["trace"])
+                if outcome.get("embeddings"):
+                    remember_embeddings([r["cleaned"] for r in outcome["results"]], outcome["embeddings"])
+                if on_complete is not None:
+                    on_complete(outcome["results"], outcome["trace"])
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._replace_broken(executor)
+                self._events.put((job.id, "error", str(e)))
+            else:
+                self._events.put((job.id, "done", outcome["trace"]))
+
+        future.add_done_callback(finish)
+        return job
@@ -0,0 +1,176 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond regex work to long T5 runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_SECONDS = "clauseease_stage_seconds"
+COUNTER_HELP = {
+    "clauseease_documents_total": "Documents analyzed.",
+    "clauseease_clauses_total": "Clauses analyzed.",
+    "clauseease_sentences_total": "Sentences produced by preprocessing.",
+    "clauseease_tokens_total": "Input tokens sent to Legal-BERT.",
+    "clauseease_generated_tokens_total": "Tokens generated by the T5 simplifier.",
+    "clauseease_simplify_skipped_total": "Sentences the readability gate passed through without T5.",
+    "clauseease_microbatches_total": "Merged model calls run by the micro-batching scheduler.",
+    "clauseease_microbatch_requests_total": "Caller requests served by those merged calls.",
+    "clauseease_revision_reused_clauses_total": "Clauses of revised contracts that reused earlier results.",
+    "clauseease_upload_bytes_total": "Bytes received in document uploads.",
+    "clauseease_uploads_deduplicated_total": "Uploads whose bytes were already stored.",
+}
+
+
+# -----------------------------------------------------------
+# Metric types
+# -----------------------------------------------------------
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide counters and per-stage latency histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {name: 0 for name in COUNTER_HELP}
+        self.stage_histograms = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_stage(self, stage: str, seconds: float):
+        with self._lock:
+            if stage not in self.stage_histograms:
+                self.stage_histograms[stage] = Histogram()
+            self.stage_histograms[stage].observe(seconds)
+
+    def render_prometheus(self) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {COUNTER_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+            lines.append(f"# HELP {STAGE_SECONDS} Wall time spent in each pipeline stage.")
+            lines.append(f"# TYPE {STAGE_SECONDS} histogram")
+            for stage, hist in sorted(self.stage_histograms.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'{STAGE_SECONDS}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{STAGE_SECONDS}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{STAGE_SECONDS}_sum{{stage="{stage}"}} {hist.total}')
+                lines.append(f'{STAGE_SECONDS}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# -----------------------------------------------------------
+# Per-request traces
+# -----------------------------------------------------------
+class Trace:
+    """Stage timings and counters collected for one request or job."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {k: round(v, 6) for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+
+_current_trace = contextvars.ContextVar("clauseease_trace", default=None)
+
+
+@contextmanager
+def tracing():
+    """Collect a Trace for everything instrumented inside the block."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def increment(name: str, value: float = 1):
+    """Bump a counter globally and on the active trace."""
+    registry.increment(name, value)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + value
+
+
+def record_stage(stage: str, seconds: float):
+    registry.observe_stage(stage, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[stage] = trace.stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block as one run of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def timed_iter(iterable, stage: str, totals: list = None):
+    """
+    Yield from `iterable`, charging only the time spent producing items to
+    `stage` (for lazy producers such as streamed page extraction). The
+    elapsed time is also appended to `totals` when given, so a consumer can
+    subtract it from its own timing.
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        record_stage(stage, elapsed)
+        if totals is not None:
+            totals.append(elapsed)
+
+
+def merge_trace(trace: dict):
+    """
+    Apply a trace recorded in another process (e.g. a job worker) to this
+    process's registry, so /metrics covers work done in the pool too.
+    """
+    for stage, seconds in trace.get("stages", {}).items():
+        registry.observe_stage(stage, seconds)
+    for name, value in trace.get("counters", {}).items():
+        registry.increment(name, value)
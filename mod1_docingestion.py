@@ -1,49 +1,421 @@
+import io
 import os
+import re
+import bisect
+import zlib
+import zipfile
+import threading
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import fitz
-from docx import Document
 
+# PDFs with at least this many pages are extracted by a process pool
+PARALLEL_PAGE_THRESHOLD = 64
+# Size of the shared extraction pool (default: one worker per CPU)
+PDF_POOL_WORKERS = int(os.environ.get("CLAUSEEASE_PDF_WORKERS", "0")) or None
+# Pages handed to one worker at a time
+PAGES_PER_TASK = 32
 
+
+class ExtractionError(Exception):
+    """Raised when a document cannot be read or its type is not supported."""
+
+
+# -----------------------------------------------------------
+# Page provenance
+# -----------------------------------------------------------
+class PageMap:
+    """
+    Maps character offsets in a joined document text back to source pages.
+    Pages are registered in order with the offset where their text starts.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._pages = []
+
+    def add(self, page, start_offset: int):
+        self._starts.append(start_offset)
+        self._pages.append(page)
+
+    def page_at(self, offset: int):
+        """Page containing `offset`, or None when nothing was registered."""
+        i = bisect.bisect_right(self._starts, offset) - 1
+        return self._pages[max(i, 0)] if self._pages else None
+
+    def __len__(self):
+        return len(self._pages)
+
+
+# -----------------------------------------------------------
+# Streaming extraction
+# -----------------------------------------------------------
+def _open_pdf(file_path, data=None):
+    if data is not None:
+        return fitz.open(stream=data, filetype="pdf")
+    return fitz.open(file_path)
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool():
+    """
+    The process pool shared by all PDF extractions in this process, created
+    on first use. Workers are spawned so they never inherit loaded models.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_POOL_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool):
+    """Drop a broken pool so the next extraction starts a fresh one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False)
+
+
+def _extract_pdf_range(file_path, start, stop):
+    """Text of pages [start, stop) of a PDF; runs inside pool workers."""
+    with fitz.open(file_path) as pdf:
+        return [pdf[i].get_text() for i in range(start, stop)]
+
+
+def iter_pdf_pages(file_path, workers=None, data=None):
+    """
+    Yield (page_number, text) for each PDF page, 1-based and in order.
+    Large PDFs stored at `file_path` are split into page ranges extracted
+    by the shared process pool; other PDFs are read page by page in this
+    process, as is every PDF when `workers` is 1 or when running inside a
+    worker process (job or batch workers never start pools of their own).
+    With `data` (the file's bytes) the serial path opens the PDF from memory.
+    """
+    serial = workers == 1 or multiprocessing.parent_process() is not None \
+        or not os.path.exists(file_path)
+    try:
+        with _open_pdf(file_path, data) as pdf:
+            page_count = pdf.page_count
+            if page_count < PARALLEL_PAGE_THRESHOLD or serial:
+                for i, page in enumerate(pdf):
+                    yield i + 1, page.get_text()
+                return
+    except Exception as e:
+        raise ExtractionError(f"Could not extract PDF: {str(e)}") from e
+
+    # Workers open the stored file themselves; the bytes are never pickled to them
+    ranges = [(s, min(s + PAGES_PER_TASK, page_count)) for s in range(0, page_count, PAGES_PER_TASK)]
+    pool = _get_pdf_pool()
+    try:
+        chunks = pool.map(_extract_pdf_range, [file_path] * len(ranges),
+                          [r[0] for r in ranges], [r[1] for r in ranges])
+        for (start, _), texts in zip(ranges, chunks):
+            for offset, text in enumerate(texts):
+                yield start + offset + 1, text
+    except BrokenProcessPool as e:
+        _discard_pdf_pool(pool)
+        raise ExtractionError(f"Could not extract PDF: {str(e)}") from e
+    except Exception as e:
+        raise ExtractionError(f"Could not extract PDF: {str(e)}") from e
+
+
+# -----------------------------------------------------------
+# DOCX: streaming WordprocessingML parser
+# -----------------------------------------------------------
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_ROMAN = [(1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+          (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+_LEVEL_PLACEHOLDER = re.compile(r"%([1-9])")
+
+
+def _roman(n: int) -> str:
+    out = []
+    for value, numeral in _ROMAN:
+        while n >= value:
+            out.append(numeral)
+            n -= value
+    return "".join(out)
+
+
+def _letters(n: int) -> str:
+    # Word repeats the letter past z: aa, bb, ...
+    return chr(ord("a") + (n - 1) % 26) * ((n - 1) // 26 + 1)
+
+
+def _format_number(n: int, fmt: str) -> str:
+    if fmt == "lowerLetter":
+        return _letters(n)
+    if fmt == "upperLetter":
+        return _letters(n).upper()
+    if fmt == "lowerRoman":
+        return _roman(n)
+    if fmt == "upperRoman":
+        return _roman(n).upper()
+    if fmt in ("bullet", "none"):
+        return ""
+    return str(n)
+
+
+def _val(elem, tag):
+    child = elem.find(_W + tag) if elem is not None else None
+    return child.get(_W + "val") if child is not None else None
+
+
+def _read_numbering(zf) -> dict:
+    """numId -> {ilvl: (numFmt, lvlText, start)} from word/numbering.xml (small, parsed whole)."""
+    try:
+        root = ET.fromstring(zf.read("word/numbering.xml"))
+    except KeyError:
+        return {}
+    abstract = {}
+    for node in root.iter(_W + "abstractNum"):
+        levels = {}
+        for lvl in node.iter(_W + "lvl"):
+            levels[int(lvl.get(_W + "ilvl", "0"))] = (
+                _val(lvl, "numFmt") or "decimal", _val(lvl, "lvlText") or "", int(_val(lvl, "start") or 1))
+        abstract[node.get(_W + "abstractNumId")] = levels
+    return {num.get(_W + "numId"): abstract.get(_val(num, "abstractNumId"), {})
+            for num in root.iter(_W + "num")}
+
+
+def _read_styles(zf) -> dict:
+    """styleId -> (style name, numId, ilvl) from word/styles.xml."""
+    try:
+        root = ET.fromstring(zf.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    styles = {}
+    for style in root.iter(_W + "style"):
+        num_pr = style.find(f"{_W}pPr/{_W}numPr")
+        styles[style.get(_W + "styleId")] = (
+            _val(style, "name"), _val(num_pr, "numId"), int(_val(num_pr, "ilvl") or 0) if num_pr is not None else 0)
+    return styles
+
+
+class _ListCounter:
+    """Renders Word list labels ("1.", "1.2", "(a)") from numbering definitions."""
+
+    def __init__(self, numbering: dict):
+        self.numbering = numbering
+        self.counters = {}
+
+    def label(self, num_id, ilvl: int):
+        levels = self.numbering.get(num_id)
+        if not levels or ilvl not in levels:
+            return None
+        counts = self.counters.setdefault(num_id, {})
+        counts[ilvl] = counts.get(ilvl, levels[ilvl][2] - 1) + 1
+        for deeper in [k for k in counts if k > ilvl]:
+            del counts[deeper]  # a new item restarts its sub-levels
+
+        def level_text(match):
+            lvl = int(match.group(1)) - 1
+            fmt, _, start = levels.get(lvl, ("decimal", "", 1))
+            return _format_number(counts.get(lvl, start), fmt)
+        return _LEVEL_PLACEHOLDER.sub(level_text, levels[ilvl][1]).strip() or None
+
+
+def _iter_part(zf, name: str, kind: str, styles: dict, counter: _ListCounter):
+    """Stream one XML part, yielding a block per paragraph or table cell; memory stays flat."""
+    with zf.open(name) as fh:
+        events = ET.iterparse(fh, events=("start", "end"))
+        container = None
+        table_depth, row, col = 0, -1, -1
+        cell_parts = []
+        for event, elem in events:
+            tag = elem.tag
+            if event == "start":
+                if container is None and tag in (_W + "body", _W + "hdr", _W + "ftr"):
+                    container = elem
+                elif tag == _W + "tbl":
+                    table_depth += 1
+                    if table_depth == 1:
+                        row = -1
+                elif tag == _W + "tr" and table_depth == 1:
+                    row, col = row + 1, -1
+                elif tag == _W + "tc" and table_depth == 1:
+                    col, cell_parts = col + 1, []
+                continue
+
+            if tag == _W + "p":
+                texts = []
+                for node in elem.iter():
+                    if node.tag == _W + "t" and node.text:
+                        texts.append(node.text)
+                    elif node.tag == _W + "tab":
+                        texts.append("\t")
+                    elif node.tag in (_W + "br", _W + "cr"):
+                        texts.append("\n")
+                text = "".join(texts).strip()
+                p_pr = elem.find(_W + "pPr")
+                style_id = _val(p_pr, "pStyle")
+                style_name, num_id, ilvl = styles.get(style_id, (None, None, 0))
+                num_pr = p_pr.find(_W + "numPr") if p_pr is not None else None
+                if num_pr is not None:
+                    num_id, ilvl = _val(num_pr, "numId") or num_id, int(_val(num_pr, "ilvl") or 0)
+                number = counter.label(num_id, ilvl) if num_id and text else None
+                if table_depth:
+                    if text:
+                        cell_parts.append(f"{number} {text}" if number else text)
+                elif text:
+                    yield {"kind": kind, "text": text, "style": style_name or style_id,
+                           "number": number, "level": ilvl if number else None}
+                elem.clear()
+            elif tag == _W + "tc" and table_depth == 1:
+                if cell_parts:
+                    yield {"kind": "table_cell", "text": "\n".join(cell_parts), "style": None,
+                           "number": None, "level": None, "row": row, "col": col}
+                cell_parts = []
+            elif tag == _W + "tbl":
+                table_depth -= 1
+
+            if container is not None and elem is not container and not table_depth and \
+                    tag in (_W + "p", _W + "tbl", _W + "sdt"):
+                container.clear()  # drop finished top-level blocks
+
+
+def iter_docx_blocks(docx_path, include_headers: bool = True):
+    """
+    Stream a DOCX without building an object model. Yields dicts in document
+    order: headers, then body paragraphs and table cells, then footers.
+    Each has "kind" ("paragraph", "table_cell", "header", "footer"), "text",
+    "style", and the rendered list "number" and "level" from numbering.xml
+    (table cells also carry "row" and "col"). `docx_path` may also be a
+    binary file object, e.g. io.BytesIO over an upload.
+    """
+    try:
+        zf = zipfile.ZipFile(docx_path)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ExtractionError(f"Could not extract DOCX: {str(e)}") from e
+    with zf:
+        names = set(zf.namelist())
+        if "word/document.xml" not in names:
+            raise ExtractionError("Could not extract DOCX: word/document.xml is missing")
+        try:
+            styles = _read_styles(zf)
+            counter = _ListCounter(_read_numbering(zf))
+            parts = [("word/document.xml", "paragraph")]
+            if include_headers:
+                headers = sorted(n for n in names if re.fullmatch(r"word/header\d*\.xml", n))
+                footers = sorted(n for n in names if re.fullmatch(r"word/footer\d*\.xml", n))
+                parts = [(n, "header") for n in headers] + parts + [(n, "footer") for n in footers]
+            for name, kind in parts:
+                yield from _iter_part(zf, name, kind, styles, counter)
+        except (ET.ParseError, zipfile.BadZipFile, zlib.error, KeyError, EOFError) as e:
+            # Malformed XML, or a corrupt member (bad CRC, broken deflate stream, truncated data)
+            raise ExtractionError(f"Could not extract DOCX: {str(e)}") from e
+
+
+def iter_docx_paragraphs(docx_path):
+    """
+    Yield (None, text) for each body paragraph and table cell (DOCX has no
+    page numbers). Word list numbering is rendered in front of the text so
+    clause segmentation sees the real numbers; headers and footers are left out.
+    """
+    for block in iter_docx_blocks(docx_path, include_headers=False):
+        text = block["text"]
+        yield None, f"{block['number']} {text}" if block["number"] else text
+
+
+def _split_pages(lines):
+    page, buffered = 1, []
+    for line in lines:
+        while '\f' in line:
+            head, line = line.split('\f', 1)
+            buffered.append(head)
+            yield page, ''.join(buffered)
+            page, buffered = page + 1, []
+        buffered.append(line)
+    if buffered:
+        yield page, ''.join(buffered)
+
+
+def iter_txt_pages(txt_path, data=None):
+    """
+    Yield (page_number, text) for a plain-text file; form feeds separate
+    pages. With `data` the bytes are decoded instead of reading `txt_path`.
+    """
+    if data is not None:
+        yield from _split_pages(io.StringIO(bytes(data).decode('utf-8', errors='replace')))
+        return
+    try:
+        with open(txt_path, 'r', encoding='utf-8', errors='replace') as fh:
+            yield from _split_pages(fh)
+    except OSError as e:
+        raise ExtractionError(f"Could not read TXT: {str(e)}") from e
+
+
+def iter_document(file_path, workers=None, data=None):
+    """
+    Detect file type and stream (page, text) units: pages for PDF/TXT,
+    paragraphs for DOCX. Raises ExtractionError instead of returning
+    "[ERROR]" strings. Pass `data` (the file's bytes, e.g. an upload held
+    in memory) to extract without touching the disk; `file_path` then only
+    supplies the extension.
+    """
+    if data is None and not os.path.exists(file_path):
+        raise ExtractionError("File not found.")
+
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.pdf':
+        return iter_pdf_pages(file_path, workers=workers, data=data)
+    elif ext == '.docx':
+        return iter_docx_paragraphs(file_path if data is None else io.BytesIO(data))
+    elif ext == '.txt':
+        return iter_txt_pages(file_path, data=data)
+    raise ExtractionError("Unsupported file type. Only PDF, DOCX and TXT are supported.")
+
+
+def extract_document(file_path, workers=None):
+    """Return (text, PageMap) for a document; raises ExtractionError."""
+    page_map = PageMap()
+    parts = []
+    offset = 0
+    for page, text in iter_document(file_path, workers=workers):
+        text = text.strip()
+        if not text:
+            continue
+        page_map.add(page, offset)
+        parts.append(text)
+        offset += len(text) + 1  # joined with "\n"
+    return "\n".join(parts), page_map
+
+
+# -----------------------------------------------------------
+# String API ("[ERROR] ..." on failure, kept for existing callers)
+# -----------------------------------------------------------
 def extract_text_from_pdf(file_path):
     """Extract and return text from a PDF file."""
-    text = ""
-    try:
-        with fitz.open(file_path) as pdf:
-            for page in pdf:
-                page_text = page.get_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
-    except Exception as e:
-        return f"[ERROR] Could not extract PDF: {str(e)}"
+    try:
+        return "\n".join(t for _, t in iter_pdf_pages(file_path) if t).strip()
+    except ExtractionError as e:
+        return f"[ERROR] {e}"
 
 
 
 def extract_text_from_docx(docx_path):
     """Extract and return text from a DOCX file."""
-    text = ""
     try:
-        doc = Document(docx_path) 
-        for para in doc.paragraphs:
-            if para.text.strip():
-                text += para.text.strip() + "\n"
-        return text.strip()
-    except Exception as e:
-        return f"[ERROR] Could not extract DOCX: {str(e)}"
+        return "\n".join(t for _, t in iter_docx_paragraphs(docx_path)).strip()
+    except ExtractionError as e:
+        return f"[ERROR] {e}"
 
 
 
 def extract_text(file_path):
     """Detect file type and extract text accordingly."""
-    if not os.path.exists(file_path):
-        return "[ERROR] File not found."
- 
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == '.pdf':
-        return extract_text_from_pdf(file_path)
-    elif ext == '.docx':
-        return extract_text_from_docx(file_path)
-    else:
-        return "[ERROR] Unsupported file type. Only PDF and DOCX are supported."
+    try:
+        return extract_document(file_path)[0]
+    except ExtractionError as e:
+        return f"[ERROR] {e}"
 
 
 
@@ -52,6 +424,6 @@ def extract_text(file_path):
 if __name__ == "__main__":
     contract_file = r"D:/Internships/Infosys SpringBoard/ClauseEase/employment_agreement.pdf"
     extracted = extract_text(contract_file)
-    
+
     print("=== Extracted Contract Text ===\n")
     print(extracted[:2000])
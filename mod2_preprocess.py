@@ -1,14 +1,250 @@
 #mod2
 
 import re
-import nltk
-import spacy
-from nltk.tokenize import sent_tokenize
-from mod1_docingestion import extract_text
+import bisect
+from model_registry import get_model
+from mod1_docingestion import extract_text, PageMap
+from document_model import strip_span
 
-# ---------------- Initialization ----------------
-nltk.download('punkt', quiet=True)
-nlp = spacy.load("en_core_web_sm")
+# Models (spaCy, NLTK punkt) are loaded lazily through model_registry, so
+# importing this module does no I/O.
+
+
+# ---------------- OFFSET-PRESERVING NORMALIZATION ----------------
+# One-to-one character substitutions, applied with str.translate
+_NORMALIZE_TABLE = str.maketrans({
+    '\xa0': ' ', '\t': ' ', '\r': ' ', '\v': ' ', '\f': '\n',
+    '“': '"', '”': '"', '’': "'", '‘': "'",
+})
+_WHITESPACE_RUN = re.compile(r'\s+')
+_COLLAPSIBLE = re.compile(r'\s{2,}|[^\S ]')
+_COLLAPSIBLE_KEEP_NEWLINES = re.compile(r'\s{2,}|[^\S \n]')
+
+
+class OffsetMap:
+    """
+    Piecewise-linear map from normalized offsets back to original offsets.
+    A breakpoint is stored only where the shift between the two changes
+    (i.e. after a collapsed whitespace run), so the map stays small.
+    """
+
+    def __init__(self):
+        self._starts = []   # normalized offset where a segment begins
+        self._shifts = []   # original offset minus normalized offset in that segment
+
+    def add(self, norm_start: int, shift: int):
+        if self._shifts and self._shifts[-1] == shift:
+            return
+        if self._starts and self._starts[-1] == norm_start:
+            self._shifts[-1] = shift
+            return
+        self._starts.append(norm_start)
+        self._shifts.append(shift)
+
+    def extend(self, other: "OffsetMap", norm_base: int = 0):
+        for start, shift in zip(other._starts, other._shifts):
+            self.add(start + norm_base, shift - norm_base)
+
+    def to_original(self, norm_offset: int) -> int:
+        i = bisect.bisect_right(self._starts, norm_offset) - 1
+        return norm_offset + (self._shifts[i] if i >= 0 else 0)
+
+
+def normalize_with_offsets(text: str, keep_newlines: bool = True, base_offset: int = 0) -> tuple:
+    """
+    Single-pass version of `clean_text` that remembers where every character
+    came from. Returns (normalized_text, OffsetMap); the map translates a
+    position in the normalized text to a position in `text` (plus
+    `base_offset`). With `keep_newlines`, whitespace runs that contain a line
+    break collapse to "\\n" instead of " ", so line-start numbering survives.
+    """
+    offsets = OffsetMap()
+    translated = text.translate(_NORMALIZE_TABLE) if text else ""
+    body = translated.strip()
+    if not body:
+        return "", offsets
+
+    # only runs that actually change are visited; single spaces (and single
+    # newlines when they are kept) already are in normalized form
+    collapsible = _COLLAPSIBLE_KEEP_NEWLINES if keep_newlines else _COLLAPSIBLE
+    pieces = []
+    pos = npos = 0
+    offsets.add(0, base_offset + len(translated) - len(translated.lstrip()))
+    shift = offsets.to_original(0)
+    for m in collapsible.finditer(body):
+        start, end = m.span()
+        pieces.append(body[pos:start])
+        pieces.append('\n' if keep_newlines and '\n' in m.group() else ' ')
+        npos += start - pos + 1
+        offsets.add(npos, shift + end - npos)
+        pos = end
+    pieces.append(body[pos:])
+    return "".join(pieces), offsets
+
+
+# ---------------- HIERARCHICAL CLAUSE SEGMENTATION ----------------
+# Markers at the start of a line: "1.", "1)", "1.1", "1.1.2.", "(a)", "(iv)"
+# Markers inside a line: multi-level numbers only ("2.3 ", "3.1.2) "), as segment_clauses did
+_CLAUSE_MARKER = re.compile(
+    r'(?:^|(?<=\n))(?:(?P<num>\d{1,2}(?:\.\d{1,2})+)[.)]?|(?P<top>\d{1,2})[.)]|\((?P<item>[a-z]{1,2}|[ivxl]{1,5})\))[ \n]'
+    r'|(?<![\w.])(?P<inline>\d{1,2}(?:\.\d{1,2})+)[.)]?[ \n]',
+    re.MULTILINE
+)
+# A marker must not be a cross-reference such as "Section 2.3 of"
+_CROSS_REFERENCE = re.compile(r'\b(?:section|clause|article|paragraph|schedule|annex|of|in|under)\s*$', re.IGNORECASE)
+_ROMAN = re.compile(r'^[ivxl]+$')
+# Longest marker text, used to re-scan the tail of the buffer on the next feed
+_MAX_MARKER_LEN = 16
+
+
+class ClauseNode:
+    """One numbered clause (or the unnumbered preamble) in the clause tree."""
+
+    __slots__ = ("number", "path", "level", "start", "end", "orig_start", "orig_end",
+                 "page", "text", "parent", "children")
+
+    def __init__(self, number, path, start, orig_start, page, parent=None):
+        self.number = number          # label as written: "1", "1.1.2", "(a)"; None for the preamble
+        self.path = path              # ("1", "1", "2", "a")
+        self.level = len(path)
+        self.start = start            # offsets into the normalized text
+        self.end = start
+        self.orig_start = orig_start  # offsets into the original (fed) text
+        self.orig_end = orig_start
+        self.page = page
+        self.text = ""
+        self.parent = parent
+        self.children = []
+
+    def walk(self):
+        """Yield this node and all descendants in document order."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def __repr__(self):
+        return f"ClauseNode({self.number!r}, level={self.level}, page={self.page})"
+
+
+class ClauseSegmenter:
+    """
+    Incremental, linear-time clause segmenter.
+
+    Feed page texts as they are extracted; each `feed` normalizes only the
+    new text, scans it once for numbering markers and returns the clauses
+    that are now complete (their end is known). `finish` closes the last one.
+    Clauses are linked into a tree: 1 -> 1.1 -> 1.1.2 -> (a).
+    """
+
+    def __init__(self):
+        self.roots = []
+        self._buffer = ""           # normalized text from the open clause onwards
+        self._buffer_base = 0       # normalized offset of _buffer[0]
+        self._offsets = OffsetMap()
+        self._orig_length = 0
+        self._pages = PageMap()
+        self._scan_from = 0         # normalized offset where the next scan starts
+        self._open = None           # clause whose end is not known yet
+        self._numbered = []         # stack of open numbered ancestors
+
+    def feed(self, text: str, page=None) -> list:
+        """Add the next chunk (usually one page) and return newly completed clauses."""
+        if self._orig_length:
+            self._orig_length += 1  # chunks are separated by one "\n"
+        normalized, offsets = normalize_with_offsets(text, base_offset=self._orig_length)
+        self._orig_length += len(text)
+        if not normalized:
+            return []
+
+        if self._buffer:
+            self._buffer += "\n"
+        norm_base = self._buffer_base + len(self._buffer)
+        self._offsets.extend(offsets, norm_base)
+        self._pages.add(page, norm_base)
+        self._buffer += normalized
+        if self._open is None:
+            self._open = self._new_node(None, (), norm_base)
+        return self._scan(final=False)
+
+    def finish(self) -> list:
+        """Close the last open clause and return it (plus any pending markers)."""
+        completed = self._scan(final=True)
+        if self._open is not None:
+            completed.append(self._close(self._open, self._buffer_base + len(self._buffer)))
+            self._open = None
+        return completed
+
+    def clauses(self) -> list:
+        """All clauses seen so far, in document order."""
+        return [node for root in self.roots for node in root.walk()]
+
+    # -- internals --
+
+    def _scan(self, final: bool) -> list:
+        completed = []
+        buf_end = self._buffer_base + len(self._buffer)
+        scan_pos = max(self._scan_from - self._buffer_base, 0)
+        for m in _CLAUSE_MARKER.finditer(self._buffer, scan_pos):
+            start = m.start() + self._buffer_base
+            if start <= self._open.start and not (self._open.number is None and start == self._open.start):
+                continue
+            if not final and m.end() >= len(self._buffer):
+                break  # marker may continue in the next chunk
+            if m.group("inline") and _CROSS_REFERENCE.search(self._buffer, max(0, m.start() - 12), m.start()):
+                continue
+            if self._open.number is None and start == self._open.start:
+                self.roots.remove(self._open)  # empty preamble: text starts with a marker
+            else:
+                completed.append(self._close(self._open, start))
+            self._open = self._open_marker(m, start)
+        self._scan_from = max(self._open.start + 1, buf_end - _MAX_MARKER_LEN)
+        # forget text that belongs to completed clauses
+        drop = self._open.start - self._buffer_base
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_base += drop
+        return completed
+
+    def _open_marker(self, m, start):
+        if m.group("item"):
+            return self._open_item(m.group("item"), start)
+        label = m.group("num") or m.group("top") or m.group("inline")
+        path = tuple(label.split("."))
+        # nearest open ancestor whose path is a prefix of this one
+        while self._numbered and self._numbered[-1].path != path[:len(self._numbered[-1].path)]:
+            self._numbered.pop()
+        while self._numbered and len(self._numbered[-1].path) >= len(path):
+            self._numbered.pop()
+        node = self._new_node(label, path, start, self._numbered[-1] if self._numbered else None)
+        self._numbered.append(node)
+        return node
+
+    def _open_item(self, label, start):
+        # items hang below the current numbered clause; roman numerals nest one
+        # level deeper below a lettered item unless they continue a letter run
+        parent = self._numbered[-1] if self._numbered else None
+        if parent is not None and parent.children:
+            last = parent.children[-1]
+            last_item = last.path[-1] if last.number and last.number.startswith("(") else None
+            if _ROMAN.match(label) and last_item and not _ROMAN.match(last_item) and \
+                    not (len(label) == 1 and ord(label) == ord(last_item) + 1):
+                parent = last
+        base = parent.path if parent is not None else ()
+        return self._new_node(f"({label})", base + (label,), start, parent)
+
+    def _new_node(self, number, path, start, parent=None):
+        node = ClauseNode(number, path, start, self._offsets.to_original(start),
+                          self._pages.page_at(start), parent)
+        (parent.children if parent is not None else self.roots).append(node)
+        return node
+
+    def _close(self, node, end):
+        local_start = node.start - self._buffer_base
+        node.text = self._buffer[local_start:end - self._buffer_base].rstrip()
+        node.end = node.start + len(node.text)
+        if node.text:
+            node.orig_end = self._offsets.to_original(node.end - 1) + 1
+        return node
 
 
 # ---------------- TEXT CLEANING ----------------
@@ -17,16 +253,11 @@ def clean_text(text: str) -> str:
     Normalize and clean legal text.
     - Remove unwanted spaces, tabs, and special characters
     - Standardize quotes
+    One translate pass plus one whitespace-collapsing pass.
     """
     if not text:
         return ""
-
-    text = text.replace('\xa0', ' ')  # non-breaking space
-    text = re.sub(r'[\t\r\f\v]', ' ', text)  # control chars
-    text = re.sub(r'\s+', ' ', text)  # collapse multiple spaces
-    text = re.sub(r'[“”]', '"', text)  # curly to straight quotes
-    text = re.sub(r"[’‘]", "'", text)  # curly apostrophes to straight
-    return text.strip()
+    return _WHITESPACE_RUN.sub(' ', text.translate(_NORMALIZE_TABLE)).strip()
 
 
 # ---------------- CLAUSE SEGMENTATION ----------------
@@ -63,6 +294,7 @@ def split_sentences(text: str) -> list:
     """
     if not text:
         return []
+    sent_tokenize = get_model("punkt")
     return sent_tokenize(text)
 
 
@@ -74,7 +306,7 @@ def extract_entities(text: str) -> list:
     """
     if not text:
         return []
-    doc = nlp(text)
+    doc = get_model("spacy")(text)
     return [(ent.text, ent.label_) for ent in doc.ents]
 
 def preprocess_clause(clause_text: str) -> dict:
@@ -97,40 +329,77 @@ def preprocess_clause(clause_text: str) -> dict:
 
 # ----------- BATCH PROCESSING -----------
 
-def preprocess_contract_text(raw_text: str) -> list:
+def preprocess_clauses_batch(clauses: list, batch_size: int = 64, n_process: int = 1) -> list:
+    """
+    Process many clauses with one streamed spaCy pass:
+    - Clean text
+    - Run the trimmed pipeline through `nlp.pipe`
+    - Take sentences and entities from that same pass; "sentence_spans"
+      holds each sentence's (start, end) in the cleaned text
+    """
+    cleaned = [clean_text(c) for c in clauses]
+    docs = get_model("spacy_batch").pipe(cleaned, batch_size=batch_size, n_process=n_process)
+
+    processed = []
+    for raw, text, doc in zip(clauses, cleaned, docs):
+        spans = [strip_span(text, s.start_char, s.end_char) for s in doc.sents]
+        spans = [(start, end) for start, end in spans if end > start]
+        processed.append({
+            "raw_text": raw,
+            "cleaned_text": text,
+            "sentences": [text[start:end] for start, end in spans],
+            "sentence_spans": spans,
+            "entities": [(ent.text, ent.label_) for ent in doc.ents]
+        })
+    return processed
+
+
+def preprocess_contract_text(raw_text: str, batch_size: int = 64, n_process: int = 1) -> list:
     """
     Preprocess an entire contract's text:
     - Clean
     - Segment into clauses
-    - Process each clause
+    - Process all clauses in one batched spaCy pass
     """
     cleaned_text = clean_text(raw_text)
     clauses = segment_clauses(cleaned_text)
+    return preprocess_clauses_batch(clauses, batch_size=batch_size, n_process=n_process)
 
-    processed = []
-    for clause in clauses:
-        result = preprocess_clause(clause)
-        processed.append(result)
 
+def preprocess_contract_pages(pages, batch_size: int = 64, n_process: int = 1) -> list:
+    """
+    Preprocess a contract streamed as (page, text) units (see
+    mod1_docingestion.iter_document). Pages go through the incremental
+    ClauseSegmenter as they arrive; every clause dict also gets its
+    "number", "level", "parent" number, source "page" and the "start"/"end"
+    offsets of the clause in the original text.
+    """
+    segmenter = ClauseSegmenter()
+    for page, text in pages:
+        segmenter.feed(text, page=page)
+    segmenter.finish()
+
+    nodes = [node for node in segmenter.clauses() if node.text]
+    processed = preprocess_clauses_batch([node.text for node in nodes],
+                                         batch_size=batch_size, n_process=n_process)
+    for clause, node in zip(processed, nodes):
+        clause.update({
+            "number": node.number,
+            "level": node.level,
+            "parent": node.parent.number if node.parent is not None else None,
+            "page": node.page,
+            "start": node.orig_start,
+            "end": node.orig_end,
+        })
     return processed
 
 
+if __name__ == "__main__":
+    # Specify your contract file path (PDF or DOCX)
+    contract_file = r"d:\Internships\Infosys SpringBoard\ClauseEase\employment_agreement.pdf"
+    contract_text = extract_text(contract_file)
 
+    processed = preprocess_contract_text(contract_text)
 
-
-
-# Import extract_text from doc1.py
-
-# import sys
-# sys.path.append(r"d:\Internships\Infosys SpringBoard\ClauseEase")
-
-
-
-# Specify your contract file path (PDF or DOCX)
-contract_file = r"d:\Internships\Infosys SpringBoard\ClauseEase\employment_agreement.pdf"
-contract_text = extract_text(contract_file)
-
-processed = preprocess_contract_text(contract_text)
-
-# Example: print the first clause's data
-print(processed[0])
\ No newline at end of file
+    # Example: print the first clause's data
+    print(processed[0])
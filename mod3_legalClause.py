@@ -1,15 +1,15 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import threading
+from collections import OrderedDict
 import torch
 import numpy as np
+from model_registry import get_model, current_backend, LEGAL_BERT_MODEL
+from metrics import increment
 from mod1_docingestion import extract_text
 from mod2_preprocess import preprocess_contract_text
 
-# Load Pretrained Legal-BERT Model
+# Pretrained Legal-BERT model, loaded lazily by model_registry on first use
 
-model_name = "nlpaueb/legal-bert-base-uncased"
-
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=5)
+model_name = LEGAL_BERT_MODEL
 
 
 # Define Clause Categories
@@ -22,31 +22,280 @@ clause_labels = {
 }
 
 # -----------------------------------------------------------
-# Function: Detect Clause Type
+# Long clauses: overlapping token windows
 # -----------------------------------------------------------
-def detect_clause_type(text: str) -> str:
+# Tokens shared by consecutive windows of a clause longer than the model context
+WINDOW_OVERLAP = 128
+# How window logits are combined into one prediction per clause
+AGGREGATIONS = ("mean", "max", "weighted")
+DEFAULT_AGGREGATION = "weighted"
+
+
+def _context_length(tokenizer, model) -> int:
+    """Content tokens that fit in one forward pass, excluding [CLS]/[SEP]."""
+    limit = getattr(model.config, "max_position_embeddings", 512)
+    limit = min(limit, tokenizer.model_max_length or limit)
+    return limit - tokenizer.num_special_tokens_to_add()
+
+
+def _windows(ids: list, size: int, overlap: int) -> list:
+    """Split content token ids into windows of `size` overlapping by `overlap`."""
+    if len(ids) <= size:
+        return [ids]
+    step = max(size - overlap, 1)
+    starts = list(range(0, len(ids) - size, step)) + [len(ids) - size]
+    return [ids[s:s + size] for s in starts]
+
+
+def _content_ids(tokenizer, texts: list) -> list:
+    return tokenizer(
+        texts,
+        add_special_tokens=False,
+        truncation=False,
+        padding=False,
+        verbose=False
+    )["input_ids"]
+
+
+def tokenize_clauses(texts: list) -> list:
     """
-    Predict the clause type for a given piece of text using Legal-BERT.
+    Legal-BERT content token ids (no special tokens) per text; what
+    `detect_clause_types(encodings=...)` expects, e.g. as cached by
+    document_model.Document.token_ids.
+    """
+    tokenizer, _ = get_model("legal_bert")
+    return _content_ids(tokenizer, texts)
+
+
+def _encode_windows(tokenizer, model, texts: list, overlap: int, truncate: bool,
+                    encodings: list = None) -> tuple:
+    """
+    Tokenize `texts` once (unless their `encodings` are given) and cut each
+    into model-sized windows with special tokens added. Returns (windows,
+    owners): `owners[w]` is the position in `texts` that window w came from.
+    """
+    size = _context_length(tokenizer, model)
+    if encodings is None:
+        encodings = _content_ids(tokenizer, texts)
+
+    windows, owners = [], []
+    for k, ids in enumerate(encodings):
+        pieces = [ids[:size]] if truncate else _windows(ids, size, overlap)
+        for piece in pieces:
+            windows.append(tokenizer.build_inputs_with_special_tokens(piece))
+            owners.append(k)
+    increment("clauseease_tokens_total", sum(len(ids) for ids in windows))
+    return windows, owners
+
+
+def _padded_batches(tokenizer, windows: list, batch_size: int):
+    """
+    Yield (window positions, padded inputs) in length-sorted order, so
+    similarly sized windows share a batch and padding stays small.
+    """
+    order = sorted(range(len(windows)), key=lambda w: len(windows[w]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        yield batch, tokenizer.pad(
+            {"input_ids": [windows[w] for w in batch]},
+            padding="longest",
+            return_tensors="pt"
+        )
+
+
+def _aggregate(logits: np.ndarray, lengths: list, method: str) -> np.ndarray:
+    if method == "max":
+        return logits.max(axis=0)
+    if method == "weighted":
+        return np.average(logits, axis=0, weights=np.asarray(lengths, dtype=np.float64))
+    return logits.mean(axis=0)
+
+
+# -----------------------------------------------------------
+# Function: Detect Clause Types (batched)
+# -----------------------------------------------------------
+def detect_clause_types(texts: list, batch_size: int = 16, aggregation: str = DEFAULT_AGGREGATION,
+                        overlap: int = WINDOW_OVERLAP, truncate: bool = False, encodings: list = None,
+                        embed: bool = False) -> list:
+    """
+    Predict clause types for many texts with as few Legal-BERT passes as possible.
+
+    Clauses longer than the model context are split into overlapping token
+    windows (`truncate=True` keeps only the first window instead). Windows
+    from all clauses are tokenized once, sorted by token length and grouped
+    into batches of `batch_size`, so each batch is padded only to its own
+    longest window. `encodings` (from tokenize_clauses, one per text) skips
+    tokenization. Window logits are combined per clause by `aggregation`
+    ("mean", "max" or length-"weighted"). With `embed=True` (and a backend
+    that has hidden states) the same forward pass also pools each clause's
+    embedding into the cache `embed_clauses` reads, so indexing the clauses
+    afterwards does not run Legal-BERT again. Returns one dict per input
+    text, in input order:
+    {"label": str, "confidence": float, "logits": list[float], "windows": int}.
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {aggregation} (expected one of {', '.join(AGGREGATIONS)})")
+    results = [{"label": "Unknown", "confidence": 0.0, "logits": [], "windows": 0} for _ in texts]
+
+    # Skip blank clauses entirely, they never reach the model
+    indices = [i for i, t in enumerate(texts) if t and t.strip()]
+    if not indices:
+        return results
+
+    tokenizer, model = get_model("legal_bert")
+    windows, owners = _encode_windows(tokenizer, model, [texts[i] for i in indices], overlap, truncate,
+                                      None if encodings is None else [encodings[i] for i in indices])
+    window_logits = [None] * len(windows)
+    # Embeddings come from untruncated windows only, as embed_clauses makes them
+    pooler = _EmbeddingPooler(len(indices), model.config.hidden_size) \
+        if embed and not truncate and overlap == WINDOW_OVERLAP and embeddings_available() else None
+
+    for batch, inputs in _padded_batches(tokenizer, windows, batch_size):
+        with torch.no_grad():
+            # Only ask for hidden states when pooling: the ONNX models take no such argument
+            outputs = model(**inputs, output_hidden_states=True) if pooler is not None else model(**inputs)
+        logits = outputs.logits
+
+        for row, w in enumerate(batch):
+            window_logits[w] = logits[row].float().cpu().numpy()
+        if pooler is not None:
+            pooler.add(outputs.hidden_states[-1], inputs["attention_mask"], batch, windows, owners)
+
+    if pooler is not None:
+        _embedding_put([texts[i] for i in indices], pooler.vectors())
+
+    per_clause = [[] for _ in indices]
+    for w, k in enumerate(owners):
+        per_clause[k].append(w)
+
+    for k, members in enumerate(per_clause):
+        combined = _aggregate(np.stack([window_logits[w] for w in members]),
+                              [len(windows[w]) for w in members], aggregation)
+        probs = np.exp(combined - combined.max())
+        probs /= probs.sum()
+        predicted = int(probs.argmax())
+        results[indices[k]] = {
+            "label": clause_labels.get(predicted, "Unknown"),
+            "confidence": round(float(probs[predicted]), 4),
+            "logits": [round(float(v), 4) for v in combined],
+            "windows": len(members)
+        }
+
+    return results
+
+
+# -----------------------------------------------------------
+# Function: Clause embeddings (for similar-clause search)
+# -----------------------------------------------------------
+# Backends whose Legal-BERT exposes hidden states (the ONNX export returns logits only)
+EMBEDDING_BACKENDS = ("torch",)
+
+
+class EmbeddingUnavailable(RuntimeError):
+    """Raised when the active inference backend cannot produce clause embeddings."""
+
+
+def embeddings_available() -> bool:
+    return current_backend() in EMBEDDING_BACKENDS
+
+
+class _EmbeddingPooler:
+    """Accumulates length-weighted mean-pooled window states into one vector per clause."""
+
+    def __init__(self, n: int, dim: int):
+        self.sums = np.zeros((n, dim), dtype=np.float64)
+        self.weights = np.zeros(n, dtype=np.float64)
+
+    def add(self, hidden, attention_mask, batch: list, windows: list, owners: list):
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        pooled = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).float().cpu().numpy()
+        for row, w in enumerate(batch):
+            self.sums[owners[w]] += pooled[row] * len(windows[w])
+            self.weights[owners[w]] += len(windows[w])
+
+    def vectors(self) -> np.ndarray:
+        pooled = self.sums / self.weights[:, None]
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+
+# Embeddings pooled by recent passes, keyed by backend, model and normalized text
+EMBEDDING_CACHE_SIZE = 20000
+_embedding_cache = OrderedDict()
+_embedding_lock = threading.Lock()
+
+
+def _embedding_key(text: str) -> tuple:
+    return (current_backend(), model_name, " ".join(text.split()))
+
+
+def _embedding_put(texts: list, vectors):
+    with _embedding_lock:
+        for text, vector in zip(texts, vectors):
+            key = _embedding_key(text)
+            _embedding_cache[key] = vector
+            _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def cached_embeddings(texts: list) -> list:
+    """Embedding per text from the cache, or None where no pass has pooled it yet."""
+    with _embedding_lock:
+        return [_embedding_cache.get(_embedding_key(t)) if t and t.strip() else None for t in texts]
+
+
+def remember_embeddings(texts: list, vectors: list):
+    """Add embeddings pooled elsewhere (e.g. by a job worker) to this process's cache."""
+    pairs = [(t, v) for t, v in zip(texts, vectors) if v is not None]
+    _embedding_put([t for t, _ in pairs], [v for _, v in pairs])
+
+
+def embed_clauses(texts: list, batch_size: int = 16, overlap: int = WINDOW_OVERLAP) -> np.ndarray:
+    """
+    Mean-pooled Legal-BERT last-layer embeddings, L2-normalized, as a
+    float32 array of shape (len(texts), hidden_size). Long clauses average
+    their windows weighted by length; blank texts get zero vectors.
+    Clauses pooled by a recent `detect_clause_types(embed=True)` pass come
+    from the cache; only the rest are encoded.
+    Needs the torch backend: the ONNX export only returns logits, so other
+    backends raise EmbeddingUnavailable.
     """
-    if not text.strip():
-        return "Unknown"
+    if not embeddings_available():
+        raise EmbeddingUnavailable(f"Clause embeddings need the torch backend (active: {current_backend()}).")
+    tokenizer, model = get_model("legal_bert")
+    vectors = np.zeros((len(texts), model.config.hidden_size), dtype=np.float32)
+    cached = cached_embeddings(texts) if overlap == WINDOW_OVERLAP else [None] * len(texts)
+    indices = []
+    for i, (text, vector) in enumerate(zip(texts, cached)):
+        if vector is not None:
+            vectors[i] = vector
+        elif text and text.strip():
+            indices.append(i)
+    if not indices:
+        return vectors
 
-    # Tokenize the input text
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding=True
-    )
+    windows, owners = _encode_windows(tokenizer, model, [texts[i] for i in indices], overlap, False)
+    pooler = _EmbeddingPooler(len(indices), model.config.hidden_size)
+    for batch, inputs in _padded_batches(tokenizer, windows, batch_size):
+        with torch.no_grad():
+            hidden = model(**inputs, output_hidden_states=True).hidden_states[-1]
+        pooler.add(hidden, inputs["attention_mask"], batch, windows, owners)
 
-    # Forward pass through the model
-    with torch.no_grad():
-        outputs = model(**inputs)
+    vectors[indices] = pooler.vectors()
+    if overlap == WINDOW_OVERLAP:
+        _embedding_put([texts[i] for i in indices], vectors[indices])
+    return vectors
 
-    logits = outputs.logits
-    predicted_class = torch.argmax(logits, dim=1).item()
 
-    return clause_labels.get(predicted_class, "Unknown")
+# -----------------------------------------------------------
+# Function: Detect Clause Type
+# -----------------------------------------------------------
+def detect_clause_type(text: str) -> str:
+    """
+    Predict the clause type for a given piece of text using Legal-BERT.
+    """
+    return detect_clause_types([text])[0]["label"]
 
 
 # -----------------------------------------------------------
@@ -65,7 +314,8 @@ if __name__ == "__main__":
 
         # Step 3 – Run clause detection on each clause
         print("✅ Running Legal Clause Detection...\n")
-        for i, clause in enumerate(processed_clauses[:5]):  # limit output to first 5 clauses
+        sample = processed_clauses[:5]  # limit output to first 5 clauses
+        detected = detect_clause_types([c["cleaned_text"] for c in sample])
+        for i, (clause, pred) in enumerate(zip(sample, detected)):
             clause_text = clause["cleaned_text"]
-            detected_type = detect_clause_type(clause_text)
-            print(f"Clause {i+1}: {detected_type}\n{clause_text}\n{'-'*80}")
\ No newline at end of file
+            print(f"Clause {i+1}: {pred['label']} ({pred['confidence']:.2f})\n{clause_text}\n{'-'*80}")
\ No newline at end of file
@@ -1,4 +1,5 @@
-import re
+import threading
+from collections import OrderedDict
 
 # -----------------------------------------------------------
 # Custom Legal Term Dictionary
@@ -16,6 +17,146 @@ legal_terms = {
     "warranty": "A promise or assurance regarding the condition or performance of something."
 }
 
+# -----------------------------------------------------------
+# Single-pass matcher (Aho-Corasick over lowercased text)
+# -----------------------------------------------------------
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class LegalTermMatcher:
+    """
+    Aho-Corasick automaton over a glossary of terms.
+
+    The automaton is built once per glossary and each text is scanned once,
+    so matching cost no longer grows with the number of terms. Matches honor
+    word boundaries like the regex `\\bterm\\b` and are case-insensitive.
+    """
+
+    def __init__(self, term_dict: dict):
+        self.term_dict = dict(term_dict)  # own copy: later edits to the glossary do not leak in
+        self._rank = {term: i for i, term in enumerate(self.term_dict)}
+        self._goto = [{}]     # state -> {char: next_state}
+        self._fail = [0]      # state -> failure link
+        self._output = [[]]   # state -> [(term, length), ...] ending at this state
+
+        for term in term_dict:
+            key = term.lower()
+            if not key:
+                continue
+            state = 0
+            for ch in key:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = nxt
+            self._output[state].append((term, len(key)))
+
+        # breadth-first pass to build failure links
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find_spans(self, text: str) -> list:
+        """
+        Return (start, end, term) for every whole-word occurrence, in text order.
+        Offsets index the lowercased text, which matches `text` except for the
+        rare characters whose lowercase form has a different length.
+        """
+        if not text:
+            return []
+        return self.scan(text.lower())
+
+    def scan(self, lowered: str) -> list:
+        """`find_spans` over text that is already lowercased (e.g. a Document buffer)."""
+        spans = []
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for pos, ch in enumerate(lowered):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for term, length in output[state]:
+                end = pos + 1
+                start = end - length
+                if (start == 0 or not _is_word_char(lowered[start - 1])) and \
+                        (end == len(lowered) or not _is_word_char(lowered[end])):
+                    spans.append((start, end, term))
+        spans.sort()
+        return spans
+
+    def match(self, text: str) -> dict:
+        """
+        Return {term: {"definition", "count", "spans"}} for every glossary term
+        found in `text`.
+        """
+        return self.collect(self.find_spans(text))
+
+    def collect(self, spans: list) -> dict:
+        """Group (start, end, term) spans into the `match` result shape."""
+        found = {}
+        for start, end, term in spans:
+            entry = found.setdefault(term, {"definition": self.term_dict[term], "count": 0, "spans": []})
+            entry["count"] += 1
+            entry["spans"].append((start, end))
+        return found
+
+    def definitions(self, found) -> dict:
+        """{term: definition} for the terms in `found`, in glossary order."""
+        return {term: self.term_dict[term] for term in sorted(found, key=self._rank.__getitem__)}
+
+    def match_batch(self, texts: list) -> list:
+        """Match a batch of clauses; returns one `match` result per text."""
+        return [self.match(t) for t in texts]
+
+
+# Matchers for the most recently used glossaries, keyed by glossary identity.
+# Each entry keeps its glossary alive so the id cannot be reused while cached.
+MATCHER_CACHE_SIZE = 16
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(term_dict: dict) -> LegalTermMatcher:
+    """
+    Return the matcher for a glossary dict, building it on first use. The
+    lookup is O(1); a glossary edited in place keeps its old matcher until
+    `invalidate_matcher(term_dict)` is called.
+    """
+    key = id(term_dict)
+    with _matchers_lock:
+        entry = _matchers.get(key)
+        if entry is not None and entry[0] is term_dict:
+            _matchers.move_to_end(key)
+            return entry[1]
+    matcher = LegalTermMatcher(term_dict)
+    with _matchers_lock:
+        _matchers[key] = (term_dict, matcher)
+        _matchers.move_to_end(key)
+        while len(_matchers) > MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def invalidate_matcher(term_dict: dict = None):
+    """Drop the cached matcher of `term_dict` (all matchers when None) after editing it."""
+    with _matchers_lock:
+        if term_dict is None:
+            _matchers.clear()
+        else:
+            _matchers.pop(id(term_dict), None)
+
+
 # -----------------------------------------------------------
 # Function: Recognize Legal Terms in Text
 # -----------------------------------------------------------
@@ -24,11 +165,32 @@ def recognize_legal_terms(text: str, term_dict: dict):
     Identify legal terms present in the given text based on the custom dictionary.
     Returns a dictionary of recognized terms and their definitions.
     """
-    found_terms = {}
-    for term in term_dict:
-        if re.search(r'\b' + re.escape(term) + r'\b', text.lower()):
-            found_terms[term] = term_dict[term]
-    return found_terms
+    matcher = get_matcher(term_dict)
+    # keep dictionary order, as the per-term loop did
+    return matcher.definitions(matcher.match(text))
+
+
+def recognize_legal_terms_batch(texts: list, term_dict: dict) -> list:
+    """
+    Recognize terms in many clauses with one shared matcher.
+    Returns, per text, {term: {"definition", "count", "spans"}}.
+    """
+    return get_matcher(term_dict).match_batch(texts)
+
+
+def recognize_document_terms(document, term_dict: dict) -> list:
+    """
+    `recognize_legal_terms` for every clause of a document_model.Document,
+    from one scan over its cached lowercased buffer. The full match (counts
+    and clause-relative spans) is stored as each clause's "terms" annotation.
+    """
+    matcher = get_matcher(term_dict)
+    per_clause = document.split_spans(matcher.scan(document.lower))
+    results = []
+    for clause, spans in zip(document.clauses, per_clause):
+        found = clause.annotate("terms", matcher.collect(spans))
+        results.append(matcher.definitions(found))
+    return results
 
 
 # -----------------------------------------------------------
@@ -1,26 +1,260 @@
-from transformers import pipeline
-import nltk
-nltk.download('punkt', quiet=True)
-from nltk.tokenize import sent_tokenize
-
-# Lightweight T5 model for paraphrasing / simplification
-simplifier = pipeline("text2text-generation", model="t5-small")  
-
-def simplify_text(text, max_length=60):
-    sentences = sent_tokenize(text)
-    simplified_sentences = []
-    
-    for sent in sentences:
-        if sent.strip():
-            simplified = simplifier(
-                sent,  # no prefix
-                max_length=120,
-                num_beams=5,
-                early_stopping=True
-            )
-            simplified_sentences.append(simplified[0]['generated_text'])
-    
-    return ' '.join(simplified_sentences)
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from model_registry import get_model, current_backend, T5_MODEL
+from metrics import increment
+from mod4_legalTermRec import get_matcher, legal_terms
+
+# Lightweight T5 model for paraphrasing / simplification, loaded lazily by
+# model_registry on first use
+simplifier_model_name = T5_MODEL
+
+# Decoding profiles: "fast" is greedy search, "quality" is the original beam search
+DECODING_PROFILES = {
+    "fast": {"num_beams": 1, "do_sample": False},
+    "quality": {"num_beams": 5, "early_stopping": True},
+}
+
+# -----------------------------------------------------------
+# Sentence -> simplification memo (shared across requests)
+# -----------------------------------------------------------
+MEMO_SIZE = 8192
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+_memo_stats = {"hits": 0, "misses": 0}
+
+
+def _memo_get(key):
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            _memo_stats["hits"] += 1
+            return _memo[key]
+        _memo_stats["misses"] += 1
+        return None
+
+
+def _memo_put(key, value):
+    with _memo_lock:
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def simplify_cache_info() -> dict:
+    """Return hit/miss counters and the current size of the sentence memo."""
+    with _memo_lock:
+        return {**_memo_stats, "size": len(_memo), "max_size": MEMO_SIZE}
+
+
+def clear_simplify_cache():
+    """Drop every memoized simplification."""
+    with _memo_lock:
+        _memo.clear()
+        _memo_stats["hits"] = _memo_stats["misses"] = 0
+
+
+# -----------------------------------------------------------
+# Readability gate: skip T5 for sentences that are already plain
+# -----------------------------------------------------------
+# Sentences scoring below this are returned unchanged. Off (0) by default,
+# since gated sentences are no longer simplified; 0.3 skips plain sentences
+GATE_THRESHOLD = float(os.environ.get("CLAUSEEASE_SIMPLIFY_THRESHOLD", "0"))
+
+# Feature weights: length, syllables per word, legalese markers, glossary terms
+GATE_WEIGHTS = np.array([0.35, 0.25, 0.25, 0.15])
+
+LEGALESE_MARKERS = dict.fromkeys([
+    "hereby", "herein", "hereinafter", "hereof", "hereto", "hereunder", "heretofore", "herewith",
+    "thereby", "therein", "thereof", "thereto", "thereunder", "whereas", "whereby", "wherein", "whereof",
+    "notwithstanding", "aforesaid", "aforementioned", "forthwith", "pursuant to", "in lieu of",
+    "inter alia", "mutatis mutandis", "shall", "provided that", "save as", "subject to",
+    "without prejudice", "in witness whereof", "indemnify", "hold harmless", "covenant", "warrant",
+], "")
+
+_WORD = re.compile(r"[A-Za-z]+")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+_gate_stats = {"scored": 0, "skipped": 0}
+_gate_lock = threading.Lock()
+
+
+def readability_scores(sentences: list) -> np.ndarray:
+    """
+    Complexity score in [0, 1] per sentence; higher means more worth
+    rewriting. Combines length, syllable density, legalese markers and
+    hits from the legal term glossary (mod4_legalTermRec.legal_terms).
+    """
+    if not sentences:
+        return np.zeros(0)
+    markers, terms = get_matcher(LEGALESE_MARKERS), get_matcher(legal_terms)
+    # One lowercased buffer for the batch ("\n" is a boundary for every pattern);
+    # each match is binned to its sentence by offset
+    lowered = [s.lower() for s in sentences]
+    starts = np.cumsum([0] + [len(s) + 1 for s in lowered[:-1]])
+    buffer = "\n".join(lowered)
+
+    def per_sentence(offsets):
+        owners = np.searchsorted(starts, np.fromiter(offsets, dtype=np.int64), side="right") - 1
+        return np.bincount(owners, minlength=len(sentences))
+
+    words = per_sentence(m.start() for m in _WORD.finditer(buffer))
+    # Vowel groups never span a non-letter, so counting them in the buffer equals counting per word
+    syllables = per_sentence(m.start() for m in _VOWEL_GROUPS.finditer(buffer))
+    features = np.column_stack([
+        words,
+        syllables / np.maximum(words, 1),
+        per_sentence(span[0] for span in markers.scan(buffer)),
+        per_sentence(span[0] for span in terms.scan(buffer)),
+    ]).astype(float)
+    # Scale each feature to [0, 1]: 40 words, 1.3-2.2 syllables/word, 2 markers, 2 terms
+    scaled = np.clip((features - [0, 1.3, 0, 0]) / [40, 0.9, 2, 2], 0, 1)
+    # Fragments under six words (headings, signature lines) are damped towards 0
+    return (scaled @ GATE_WEIGHTS) * np.minimum(features[:, 0] / 6, 1)
+
+
+def gate_sentences(sentences: list, threshold: float = None) -> list:
+    """Mask of the sentences that should go to T5 (True) or pass through unchanged (False)."""
+    threshold = GATE_THRESHOLD if threshold is None else threshold
+    if not threshold:
+        return [True] * len(sentences)
+    keep = (readability_scores(sentences) >= threshold).tolist()
+    skipped = keep.count(False)
+    with _gate_lock:
+        _gate_stats["scored"] += len(sentences)
+        _gate_stats["skipped"] += skipped
+    if skipped:
+        increment("clauseease_simplify_skipped_total", skipped)
+    return keep
+
+
+def simplify_gate_info() -> dict:
+    """Sentences scored by the readability gate and how many skipped T5."""
+    with _gate_lock:
+        return {**_gate_stats, "threshold": GATE_THRESHOLD}
+
+
+# -----------------------------------------------------------
+# Generation engine: T5 over normalized, de-duplicated sentences
+# -----------------------------------------------------------
+def generate_simplifications(sentences: list, profile: str = "quality", batch_size: int = 16,
+                             max_length: int = 120) -> list:
+    """
+    Run T5 over non-blank sentences in token-length-sorted batches, so each
+    batch pads only to its own longest sentence. Returns outputs in input order.
+    """
+    simplifier = get_model("t5")
+    lengths = [len(ids) for ids in simplifier.tokenizer(sentences)["input_ids"]]
+    order = sorted(range(len(sentences)), key=lambda i: lengths[i])
+    outputs = [None] * len(sentences)
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        generated = [out['generated_text'] for out in simplifier(
+            [sentences[i] for i in batch],  # no prefix
+            max_length=max_length,
+            batch_size=len(batch),
+            **DECODING_PROFILES[profile]
+        )]
+        increment("clauseease_generated_tokens_total",
+                  sum(len(ids) for ids in simplifier.tokenizer(generated, add_special_tokens=False)["input_ids"]))
+        for i, text in zip(batch, generated):
+            outputs[i] = text
+    return outputs
+
+
+_generation_engine = generate_simplifications
+
+
+def set_generation_engine(engine=None):
+    """
+    Route memo misses through `engine(sentences, profile=, batch_size=,
+    max_length=)` instead of calling T5 directly (e.g. the cross-request
+    scheduler in inference_scheduler). None restores the direct engine.
+    """
+    global _generation_engine
+    _generation_engine = engine or generate_simplifications
+
+
+# -----------------------------------------------------------
+# Function: Simplify Sentences (batched, deduplicated, memoized)
+# -----------------------------------------------------------
+def simplify_sentences(sentences: list, profile: str = "quality", batch_size: int = 16,
+                       max_length: int = 120, gate_threshold: float = None) -> list:
+    """
+    Simplify a list of sentences with as few T5 generate calls as possible.
+
+    Duplicate sentences are generated once, sentences already in the memo are
+    not generated at all, sentences the readability gate scores below
+    `gate_threshold` (default GATE_THRESHOLD) come back unchanged, and the
+    rest go to the generation engine in one call.
+    Returns simplifications in input order ("" for blank sentences).
+    """
+    if profile not in DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile: {profile}")
+
+    # Keyed by backend and model too: outputs from one must not be served for another
+    scope = (current_backend(), simplifier_model_name, profile, max_length)
+    keys = [scope + (" ".join(s.split()),) for s in sentences]
+    resolved = {}
+    pending = []
+    for key in dict.fromkeys(keys):  # ordered de-duplication
+        if not key[-1]:
+            resolved[key] = ""
+            continue
+        cached = _memo_get(key)
+        if cached is not None:
+            resolved[key] = cached
+        else:
+            pending.append(key)
+
+    if pending:
+        keep = gate_sentences([k[-1] for k in pending], gate_threshold)
+        for key in (k for k, needed in zip(pending, keep) if not needed):
+            resolved[key] = key[-1]
+        pending = [k for k, needed in zip(pending, keep) if needed]
+
+    if pending:
+        generated = _generation_engine([k[-1] for k in pending], profile=profile, batch_size=batch_size,
+                                       max_length=max_length)
+        for key, text in zip(pending, generated):
+            resolved[key] = text
+            _memo_put(key, text)
+
+    return [resolved[k] for k in keys]
+
+
+# -----------------------------------------------------------
+# Function: Simplify a whole document in one call
+# -----------------------------------------------------------
+def simplify_document(texts: list, profile: str = "quality", batch_size: int = 16,
+                      max_length: int = 120, gate_threshold: float = None) -> list:
+    """
+    Simplify every clause of a document with a single batched engine call.
+    Returns one simplified string per input text.
+    """
+    sent_tokenize = get_model("punkt")
+    clause_sentences = [[s for s in sent_tokenize(t) if s.strip()] if t else [] for t in texts]
+    return simplify_clause_sentences(clause_sentences, profile=profile, batch_size=batch_size,
+                                     max_length=max_length, gate_threshold=gate_threshold)
+
+
+def simplify_clause_sentences(clause_sentences: list, profile: str = "quality", batch_size: int = 16,
+                              max_length: int = 120, gate_threshold: float = None) -> list:
+    """
+    `simplify_document` for clauses that are already split into sentences
+    (e.g. document_model.Document.sentence_texts()), so punkt is not run again.
+    """
+    flat = [s for sents in clause_sentences for s in sents]
+    simplified = iter(simplify_sentences(flat, profile=profile, batch_size=batch_size,
+                                         max_length=max_length, gate_threshold=gate_threshold))
+    return [' '.join(next(simplified) for _ in sents) for sents in clause_sentences]
+
+
+def simplify_text(text, max_length=120, profile="quality"):
+    return simplify_document([text], profile=profile, max_length=max_length)[0]
 
 
 # Example Usage
@@ -0,0 +1,192 @@
+import os
+import threading
+
+# -----------------------------------------------------------
+# Model configuration
+# -----------------------------------------------------------
+LEGAL_BERT_MODEL = "nlpaueb/legal-bert-base-uncased"
+LEGAL_BERT_NUM_LABELS = 5
+T5_MODEL = "t5-small"
+SPACY_MODEL = "en_core_web_sm"
+
+# Components the spaCy batch path never reads. NER and the statistical
+# sentence recognizer ("senter", off by default) each carry their own
+# tok2vec, so the shared tok2vec, tagger and parser can all go.
+SPACY_BATCH_EXCLUDED_PIPES = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+# Models loaded by `preload()` when no names are given, e.g.
+# CLAUSEEASE_PRELOAD_MODELS="punkt,spacy_batch,legal_bert,t5". Empty means
+# everything stays lazy and loads on first use.
+PRELOAD_MODELS = [m.strip() for m in os.environ.get("CLAUSEEASE_PRELOAD_MODELS", "").split(",") if m.strip()]
+
+# Inference backend for legal_bert and t5: "torch" (default) or "onnx"
+# (int8-quantized ONNX Runtime on CPU, see onnx_backend.py)
+BACKENDS = ("torch", "onnx")
+INFERENCE_BACKEND = os.environ.get("CLAUSEEASE_BACKEND", "torch").strip().lower() or "torch"
+
+
+# -----------------------------------------------------------
+# Loaders (heavy imports happen here, never at module import)
+# -----------------------------------------------------------
+def _load_punkt():
+    import nltk
+    from nltk.tokenize import sent_tokenize
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+    return sent_tokenize
+
+
+def _load_spacy():
+    import spacy
+    return spacy.load(SPACY_MODEL)
+
+
+def _load_spacy_batch():
+    import spacy
+    nlp = spacy.load(SPACY_MODEL, exclude=SPACY_BATCH_EXCLUDED_PIPES)
+    if "senter" in nlp.disabled:
+        nlp.enable_pipe("senter")
+    return nlp
+
+
+def _load_legal_bert():
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    tokenizer = AutoTokenizer.from_pretrained(LEGAL_BERT_MODEL)
+    model = AutoModelForSequenceClassification.from_pretrained(LEGAL_BERT_MODEL, num_labels=LEGAL_BERT_NUM_LABELS)
+    model.eval()
+    return tokenizer, model
+
+
+def _load_t5():
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=T5_MODEL)
+
+
+_loaders = {
+    "punkt": _load_punkt,
+    "spacy": _load_spacy,
+    "spacy_batch": _load_spacy_batch,
+    "legal_bert": _load_legal_bert,
+    "t5": _load_t5,
+}
+_models = {}
+_locks = {name: threading.Lock() for name in _loaders}
+_registry_lock = threading.Lock()
+
+
+# -----------------------------------------------------------
+# Registry API
+# -----------------------------------------------------------
+def register_loader(name: str, loader):
+    """
+    Register (or replace) the loader for a model name. Replacing a loader
+    drops any instance already loaded under that name.
+    """
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        _models.pop(name, None)
+
+
+def get_model(name: str):
+    """Return the named model, loading it on first use (thread-safe)."""
+    try:
+        return _models[name]
+    except KeyError:
+        pass
+    if name not in _loaders:
+        raise KeyError(f"Unknown model: {name}")
+    with _locks[name]:
+        if name not in _models:
+            _models[name] = _loaders[name]()
+        return _models[name]
+
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+
+def available_models() -> list:
+    return list(_loaders)
+
+
+def set_backend(name: str):
+    """
+    Switch the legal_bert and t5 loaders to the given backend. Models
+    already loaded under those names are dropped and reload lazily.
+    """
+    global INFERENCE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name} (expected one of {', '.join(BACKENDS)})")
+    if name == "onnx":
+        import onnx_backend
+        onnx_backend.install()
+    else:
+        register_loader("legal_bert", _load_legal_bert)
+        register_loader("t5", _load_t5)
+    INFERENCE_BACKEND = name
+
+
+def current_backend() -> str:
+    return INFERENCE_BACKEND
+
+
+def _hub_cache_dir() -> str:
+    if os.environ.get("HF_HUB_CACHE"):
+        return os.environ["HF_HUB_CACHE"]
+    hf_home = os.environ.get("HF_HOME") or os.path.join(os.path.expanduser("~"), ".cache", "huggingface")
+    return os.path.join(hf_home, "hub")
+
+
+def model_revision(repo_id: str, revision: str = "main"):
+    """
+    Commit hash that `revision` of a Hub model resolves to in the local
+    Hugging Face cache, read from the cache's refs without loading the
+    model. None when the model has not been downloaded yet.
+    """
+    ref = os.path.join(_hub_cache_dir(), "models--" + repo_id.replace("/", "--"), "refs", revision)
+    try:
+        with open(ref, "r", encoding="utf-8") as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+
+def preload(names=None) -> list:
+    """
+    Load models eagerly. Call this in the parent process before workers
+    fork (e.g. gunicorn --preload) so they share the weights copy-on-write.
+    Returns the names that were loaded.
+    """
+    names = PRELOAD_MODELS if names is None else names
+    for name in names:
+        get_model(name)
+    return list(names)
+
+
+def warmup(names=None) -> list:
+    """
+    Preload models and run one tiny inference through each, so the first
+    real request does not pay for lazy initialisation inside the libraries.
+    """
+    names = preload(names)
+    for name in names:
+        model = get_model(name)
+        if name == "punkt":
+            model("Warm up. Done.")
+        elif name in ("spacy", "spacy_batch"):
+            model("Warm up the pipeline.")
+        elif name == "legal_bert":
+            import torch
+            tokenizer, classifier = model
+            with torch.no_grad():
+                classifier(**tokenizer("Warm up the classifier.", return_tensors="pt"))
+        elif name == "t5":
+            model("Warm up the simplifier.", max_length=8)
+    return names
+
+
+if INFERENCE_BACKEND != "torch":
+    set_backend(INFERENCE_BACKEND)
@@ -0,0 +1,238 @@
+"""
+Quantized ONNX Runtime CPU backend for the Legal-BERT and T5 models.
+
+    python onnx_backend.py export            # export + int8 dynamic quantization
+    python onnx_backend.py parity            # compare against the torch backend
+
+Select it at runtime with CLAUSEEASE_BACKEND=onnx (or model_registry.set_backend("onnx")).
+Needs the optional packages: pip install "optimum[onnxruntime]"
+"""
+import os
+import sys
+import time
+import shutil
+import difflib
+import argparse
+
+import model_registry
+
+ONNX_MODEL_DIR = os.environ.get("CLAUSEEASE_ONNX_DIR",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models"))
+# 0 lets ONNX Runtime pick (one thread per physical core)
+INTRA_OP_THREADS = int(os.environ.get("CLAUSEEASE_ORT_INTRA_THREADS", "0"))
+INTER_OP_THREADS = int(os.environ.get("CLAUSEEASE_ORT_INTER_THREADS", "1"))
+
+LEGAL_BERT_DIR = os.path.join(ONNX_MODEL_DIR, "legal_bert")
+# The torch weights the Legal-BERT export was made from. The base checkpoint
+# has no trained classifier head, so every fresh load draws a new random one;
+# parity is only meaningful against these saved weights.
+LEGAL_BERT_TORCH_DIR = os.path.join(ONNX_MODEL_DIR, "legal_bert_torch")
+T5_DIR = os.path.join(ONNX_MODEL_DIR, "t5")
+QUANTIZED_SUFFIX = "_quantized"
+
+
+def _require_optimum():
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError('The ONNX backend needs optimum and onnxruntime. '
+                           'Install with: pip install "optimum[onnxruntime]"') from e
+
+
+def session_options():
+    """ONNX Runtime session options with the configured thread counts."""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = INTRA_OP_THREADS
+    options.inter_op_num_threads = INTER_OP_THREADS
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+# -----------------------------------------------------------
+# Export + int8 dynamic quantization
+# -----------------------------------------------------------
+def _quantize_dir(model_dir: str) -> list:
+    """Write an int8 dynamically quantized copy next to every .onnx file in `model_dir`."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    written = []
+    for name in sorted(os.listdir(model_dir)):
+        if name.endswith(".onnx") and QUANTIZED_SUFFIX not in name:
+            target = os.path.join(model_dir, name[:-5] + QUANTIZED_SUFFIX + ".onnx")
+            quantize_dynamic(os.path.join(model_dir, name), target, weight_type=QuantType.QInt8)
+            written.append(target)
+    return written
+
+
+def export_models(output_dir: str = ONNX_MODEL_DIR) -> dict:
+    """
+    Export Legal-BERT and T5 to ONNX and quantize both to int8. Legal-BERT
+    is loaded once, saved as torch weights (legal_bert_torch/) and exported
+    from that copy, so the ONNX model and the parity reference share a head.
+    """
+    _require_optimum()
+    from transformers import AutoTokenizer
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTModelForSeq2SeqLM
+
+    bert_dir = os.path.join(output_dir, "legal_bert")
+    torch_dir = os.path.join(output_dir, "legal_bert_torch")
+    t5_dir = os.path.join(output_dir, "t5")
+    for path in (bert_dir, torch_dir, t5_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    tokenizer, torch_bert = model_registry._load_legal_bert()
+    torch_bert.save_pretrained(torch_dir)
+    tokenizer.save_pretrained(torch_dir)
+    bert = ORTModelForSequenceClassification.from_pretrained(torch_dir, export=True)
+    bert.save_pretrained(bert_dir)
+    tokenizer.save_pretrained(bert_dir)
+
+    t5 = ORTModelForSeq2SeqLM.from_pretrained(model_registry.T5_MODEL, export=True)
+    t5.save_pretrained(t5_dir)
+    AutoTokenizer.from_pretrained(model_registry.T5_MODEL).save_pretrained(t5_dir)
+
+    return {"legal_bert": _quantize_dir(bert_dir), "t5": _quantize_dir(t5_dir)}
+
+
+# -----------------------------------------------------------
+# Registry loaders
+# -----------------------------------------------------------
+def _quantized(model_dir: str, name: str) -> str:
+    quantized = name[:-5] + QUANTIZED_SUFFIX + ".onnx"
+    return quantized if os.path.exists(os.path.join(model_dir, quantized)) else name
+
+
+def load_legal_bert(model_dir: str = LEGAL_BERT_DIR):
+    _require_optimum()
+    from transformers import AutoTokenizer
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    if not os.path.isdir(model_dir):
+        raise RuntimeError(f"No exported Legal-BERT in {model_dir}; run: python onnx_backend.py export")
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir, file_name=_quantized(model_dir, "model.onnx"),
+        session_options=session_options(), provider="CPUExecutionProvider")
+    return tokenizer, model
+
+
+def load_t5(model_dir: str = T5_DIR):
+    _require_optimum()
+    from transformers import AutoTokenizer, pipeline
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    if not os.path.isdir(model_dir):
+        raise RuntimeError(f"No exported T5 in {model_dir}; run: python onnx_backend.py export")
+    model = ORTModelForSeq2SeqLM.from_pretrained(
+        model_dir,
+        encoder_file_name=_quantized(model_dir, "encoder_model.onnx"),
+        decoder_file_name=_quantized(model_dir, "decoder_model.onnx"),
+        decoder_with_past_file_name=_quantized(model_dir, "decoder_with_past_model.onnx"),
+        session_options=session_options(), provider="CPUExecutionProvider")
+    return pipeline("text2text-generation", model=model, tokenizer=AutoTokenizer.from_pretrained(model_dir))
+
+
+def install():
+    """Route the registry's legal_bert and t5 entries to the ONNX Runtime models."""
+    model_registry.register_loader("legal_bert", load_legal_bert)
+    model_registry.register_loader("t5", load_t5)
+
+
+# -----------------------------------------------------------
+# Parity check against the torch backend
+# -----------------------------------------------------------
+def _classify(tokenizer, model, texts):
+    import numpy as np
+    logits = []
+    for start in range(0, len(texts), 16):
+        inputs = tokenizer(texts[start:start + 16], truncation=True, padding=True, return_tensors="pt")
+        out = model(**inputs).logits
+        logits.append(out.detach().numpy() if hasattr(out, "detach") else np.asarray(out))
+    return np.concatenate(logits)
+
+
+def _load_torch_reference(model_dir: str = LEGAL_BERT_TORCH_DIR):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    if not os.path.isdir(model_dir):
+        raise RuntimeError(f"No saved Legal-BERT reference in {model_dir}; run: python onnx_backend.py export")
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    return AutoTokenizer.from_pretrained(model_dir), model
+
+
+def parity_check(clauses: list, sentences: list) -> dict:
+    """
+    Run both backends on the same inputs and report label agreement and
+    logit differences for Legal-BERT, exact/approximate output agreement
+    for T5, and the wall time of each backend. The Legal-BERT reference is
+    the torch copy saved by export_models, not a fresh load.
+    """
+    import torch
+    import numpy as np
+
+    report = {}
+    torch_tok, torch_model = _load_torch_reference()
+    onnx_tok, onnx_model = load_legal_bert()
+    start = time.perf_counter()
+    with torch.no_grad():
+        ref = _classify(torch_tok, torch_model, clauses)
+    torch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    got = _classify(onnx_tok, onnx_model, clauses)
+    onnx_seconds = time.perf_counter() - start
+    diff = np.abs(ref - got)
+    report["legal_bert"] = {
+        "inputs": len(clauses),
+        "label_agreement": float((ref.argmax(axis=1) == got.argmax(axis=1)).mean()) if len(clauses) else None,
+        "max_abs_logit_diff": float(diff.max()) if diff.size else 0.0,
+        "mean_abs_logit_diff": float(diff.mean()) if diff.size else 0.0,
+        "torch_seconds": round(torch_seconds, 3),
+        "onnx_seconds": round(onnx_seconds, 3),
+    }
+
+    torch_t5, onnx_t5 = model_registry._load_t5(), load_t5()
+    start = time.perf_counter()
+    ref_text = [o["generated_text"] for o in torch_t5(sentences, max_length=120, num_beams=1)]
+    torch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    got_text = [o["generated_text"] for o in onnx_t5(sentences, max_length=120, num_beams=1)]
+    onnx_seconds = time.perf_counter() - start
+    ratios = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(ref_text, got_text)]
+    report["t5"] = {
+        "inputs": len(sentences),
+        "exact_match": sum(a == b for a, b in zip(ref_text, got_text)) / len(sentences) if sentences else None,
+        "mean_similarity": sum(ratios) / len(ratios) if ratios else None,
+        "torch_seconds": round(torch_seconds, 3),
+        "onnx_seconds": round(onnx_seconds, 3),
+    }
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ONNX Runtime backend tools for ClauseEase.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="export and int8-quantize Legal-BERT and T5")
+    export.add_argument("--out", default=ONNX_MODEL_DIR)
+    parity = sub.add_parser("parity", help="compare the ONNX backend with the torch backend")
+    parity.add_argument("--document", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           "employment_agreement.pdf"))
+    parity.add_argument("--limit", type=int, default=64, help="clauses/sentences to compare")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        written = export_models(args.out)
+        for name, files in written.items():
+            print(f"{name}: {len(files)} quantized file(s) in {os.path.dirname(files[0]) if files else args.out}")
+        return 0
+
+    from pipeline import preprocess_document
+    processed = preprocess_document(args.document)[:args.limit]
+    clauses = [c["cleaned_text"] for c in processed if c["cleaned_text"]]
+    sentences = [s for c in processed for s in c["sentences"]][:args.limit]
+    report = parity_check(clauses, sentences)
+    for name, stats in report.items():
+        print(f"{name}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
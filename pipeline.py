@@ -0,0 +1,139 @@
+import time
+from mod1_docingestion import iter_document
+from mod2_preprocess import preprocess_contract_text, preprocess_contract_pages
+from inference_scheduler import classify
+from mod4_legalTermRec import recognize_document_terms, legal_terms
+from mod5_LangSimple import simplify_clause_sentences
+from document_model import Document
+from analysis_cache import clause_cache, model_fingerprint
+from metrics import stage_timer, timed_iter, record_stage, increment
+
+# Pipeline stages in execution order (used for progress reporting)
+STAGES = ("extract", "preprocess", "classify", "terms", "simplify")
+
+
+def _report(progress, stage, done, total):
+    if progress is not None:
+        progress(stage, done, total)
+
+
+# -----------------------------------------------------------
+# Clause-level analysis: detect -> terms -> simplify
+# -----------------------------------------------------------
+def analyze_clauses(processed_clauses: list, profile: str = "quality", start_index: int = 1,
+                    progress=None, total=None, embed: bool = False) -> list:
+    """
+    Run the model stages over preprocessed clauses and return the results
+    list stored in `<file>.results.json`. Clauses already in the clause
+    cache skip the model stages entirely; the rest are put in one
+    document_model.Document, so the stages share its sentence boundaries,
+    lowercased text and token ids.
+
+    `progress(stage, done, total)` is called after each model stage; `total`
+    is the clause count of the whole document when this is one chunk of it.
+    With `embed`, classification also pools the clause embeddings the
+    similarity index needs (see mod3_legalClause.embed_clauses).
+    """
+    fingerprint = model_fingerprint(profile)
+    cleaned = [c['cleaned_text'] for c in processed_clauses]
+    analyses = [clause_cache.get(t, fingerprint) for t in cleaned]
+    total = total or len(processed_clauses)
+    done = start_index - 1 + len(processed_clauses)
+
+    missing = [i for i, a in enumerate(analyses) if a is None]
+    if missing:
+        document = Document.from_processed([processed_clauses[i] for i in missing])
+        texts = document.texts()
+        with stage_timer("classify"):
+            clause_types = classify(texts, document=document, embed=embed)
+        _report(progress, "classify", done, total)
+        with stage_timer("terms"):
+            clause_terms = recognize_document_terms(document, legal_terms)
+        _report(progress, "terms", done, total)
+        with stage_timer("simplify"):
+            simplified = simplify_clause_sentences(document.sentence_texts(), profile=profile)
+        for j, i in enumerate(missing):
+            analyses[i] = {
+                'type': clause_types[j]['label'],
+                'confidence': clause_types[j]['confidence'],
+                'windows': clause_types[j]['windows'],
+                'terms': clause_terms[j],
+                'simple': simplified[j]
+            }
+            clause_cache.put(cleaned[i], fingerprint, analyses[i])
+    else:
+        _report(progress, "classify", done, total)
+        _report(progress, "terms", done, total)
+    _report(progress, "simplify", done, total)
+
+    results = []
+    for i, c in enumerate(processed_clauses):
+        results.append({
+            'index': start_index + i,
+            'raw': c['raw_text'],
+            'cleaned': c['cleaned_text'],
+            'number': c.get('number'),
+            'parent': c.get('parent'),
+            'page': c.get('page'),
+            'entities': c.get('entities', []),
+            **analyses[i]
+        })
+    return results
+
+
+def iter_analyze_clauses(processed_clauses: list, profile: str = "quality", chunk_size: int = 16,
+                         progress=None, embed: bool = False):
+    """
+    Yield clause results chunk by chunk, so callers can show each clause as
+    soon as its type, terms and simplification are ready. Each chunk still
+    goes through the batched model stages.
+    """
+    total = len(processed_clauses)
+    for start in range(0, total, chunk_size):
+        chunk = processed_clauses[start:start + chunk_size]
+        yield from analyze_clauses(chunk, profile=profile, start_index=start + 1,
+                                   progress=progress, total=total, embed=embed)
+
+
+def _count_preprocessed(processed_clauses: list):
+    increment("clauseease_documents_total")
+    increment("clauseease_clauses_total", len(processed_clauses))
+    increment("clauseease_sentences_total", sum(len(c['sentences']) for c in processed_clauses))
+
+
+def analyze_contract(contract_text: str, profile: str = "quality", progress=None) -> list:
+    """Preprocess a contract's text and analyze all of its clauses."""
+    with stage_timer("preprocess"):
+        processed_clauses = preprocess_contract_text(contract_text)
+    _count_preprocessed(processed_clauses)
+    _report(progress, "preprocess", len(processed_clauses), len(processed_clauses))
+    return analyze_clauses(processed_clauses, profile=profile, progress=progress)
+
+
+def preprocess_document(file_path: str, progress=None, workers=None, data=None) -> list:
+    """
+    Stream a PDF/DOCX/TXT file page by page into preprocessing. Extraction
+    and preprocessing interleave, so each is timed separately. `workers`
+    is passed to PDF extraction (1 keeps it in this process); `data` holds
+    the file's bytes when it is already in memory (see iter_document).
+    Raises mod1_docingestion.ExtractionError when the file cannot be read.
+    """
+    extract_seconds = []
+    start = time.perf_counter()
+    pages = iter_document(file_path, workers=workers, data=data)
+    processed_clauses = preprocess_contract_pages(timed_iter(pages, "extract", extract_seconds))
+    record_stage("preprocess", time.perf_counter() - start - sum(extract_seconds))
+    _count_preprocessed(processed_clauses)
+    _report(progress, "extract", 1, 1)
+    _report(progress, "preprocess", len(processed_clauses), len(processed_clauses))
+    return processed_clauses
+
+
+def analyze_document(file_path: str, profile: str = "quality", progress=None, data=None,
+                     embed: bool = False) -> list:
+    """
+    Extract, preprocess and analyze every clause of a document (from
+    `data` when its bytes are in memory); each result records its source page.
+    """
+    processed_clauses = preprocess_document(file_path, progress=progress, data=data)
+    return analyze_clauses(processed_clauses, profile=profile, progress=progress, embed=embed)
@@ -0,0 +1,175 @@
+import io
+import os
+import hashlib
+import threading
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+# Bump whenever the drawing code below changes; it is part of the report cache key
+REPORT_LAYOUT_VERSION = 2
+
+
+# -----------------------------------------------------------
+# Function: Render analysis results as a PDF report
+# -----------------------------------------------------------
+def write_results_pdf(results: list, filename: str, out):
+    """
+    Draw the analysis results for `filename` into `out`, a path or a
+    writable binary file object. Text is wrapped by measured glyph width.
+    """
+    c = canvas.Canvas(out, pagesize=letter)
+    width, height = letter
+    margin = 72
+    y = height - margin
+
+    # header
+    c.setFont('Helvetica-Bold', 16)
+    c.drawString(margin, y, f'Analysis Results — {filename}')
+    y -= 24
+
+    def ensure_space(needed, font, size):
+        nonlocal y
+        if y < margin + needed:
+            c.showPage()
+            y = height - margin
+        c.setFont(font, size)
+
+    def write_wrapped(text, indent=0, font='Helvetica', size=10, leading=12):
+        nonlocal y
+        for ln in simpleSplit(text or '', font, size, width - 2 * margin - indent):
+            ensure_space(40, font, size)
+            c.drawString(margin + indent, y, ln)
+            y -= leading
+
+    for r in results:
+        ensure_space(80, 'Helvetica-Bold', 12)
+        c.drawString(margin, y, f"Clause {r.get('index')} — {r.get('type')}")
+        y -= 14
+        write_wrapped(r.get('cleaned', ''), indent=8)
+        y -= 6
+        # terms
+        terms = r.get('terms') or {}
+        if terms:
+            ensure_space(40, 'Helvetica-Bold', 10)
+            c.drawString(margin + 8, y, 'Terms:')
+            y -= 12
+            for t, info in terms.items():
+                definition = info.get('definition') if isinstance(info, dict) else info
+                method = info.get('method') if isinstance(info, dict) else ''
+                write_wrapped(f"- {t}: {definition} ({method})", indent=16, size=9)
+                y -= 4
+        else:
+            ensure_space(40, 'Helvetica', 10)
+            c.drawString(margin + 8, y, 'Terms: None')
+            y -= 14
+
+        # simplified
+        ensure_space(40, 'Helvetica-Bold', 10)
+        c.drawString(margin + 8, y, 'Simplified:')
+        y -= 12
+        write_wrapped(r.get('simple', ''), indent=16)
+        y -= 12
+
+    c.save()
+
+
+# -----------------------------------------------------------
+# Generated report cache (on disk)
+# -----------------------------------------------------------
+class ReportCache:
+    """
+    Finished PDF reports keyed on the SHA-256 of the results file, the
+    report title and REPORT_LAYOUT_VERSION. Reports are rendered straight
+    to disk and served from there; least recently used files are removed
+    once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._building = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, results_path: str, filename: str, chunk_size: int = 1 << 20) -> str:
+        digest = hashlib.sha256(f"{REPORT_LAYOUT_VERSION}\0{filename}\0".encode("utf-8"))
+        with open(results_path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str):
+        """Path of a cached report, or None."""
+        path = self._path(key)
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return None
+        return path
+
+    def get_or_build(self, results_path: str, filename: str, load_results):
+        """
+        Path of the report for `results_path`, rendering it on a miss.
+        Concurrent requests for the same report wait for one render.
+        `load_results(results_path)` returns the results list. If the
+        rendered file cannot be moved into the cache, the report is
+        returned in memory (an io.BytesIO) instead.
+        """
+        key = self.key(results_path, filename)
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            path = self.get(key)
+            if path is None:
+                path = self._path(key)
+                # pid as well: two gunicorn workers may run threads with the same ident
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    write_results_pdf(load_results(results_path), filename, tmp_path)
+                    try:
+                        os.replace(tmp_path, path)
+                    except OSError:
+                        # Not cached this time; serve what was rendered
+                        with open(tmp_path, "rb") as fh:
+                            path = io.BytesIO(fh.read())
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                if isinstance(path, str):
+                    self._evict(keep=path)
+        with self._lock:
+            self._building.pop(key, None)
+        return path
+
+    def _evict(self, keep: str):
+        with self._lock:
+            entries, total = [], 0
+            for name in os.listdir(self.directory):
+                if name.endswith(".pdf"):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
@@ -0,0 +1,372 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Recorded in PRAGMA user_version; bump when the tables below change
+STORE_SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    uploaded_by TEXT,
+    fingerprint TEXT,
+    clause_count INTEGER NOT NULL DEFAULT 0,
+    analyzed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clause_types (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS clauses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    number TEXT,
+    parent TEXT,
+    page INTEGER,
+    raw TEXT,
+    cleaned TEXT,
+    type_id INTEGER REFERENCES clause_types(id),
+    confidence REAL,
+    simple TEXT
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE,
+    definition TEXT
+);
+CREATE TABLE IF NOT EXISTS clause_terms (
+    clause_id INTEGER NOT NULL REFERENCES clauses(id) ON DELETE CASCADE,
+    term_id INTEGER NOT NULL REFERENCES terms(id),
+    PRIMARY KEY (clause_id, term_id)
+);
+CREATE TABLE IF NOT EXISTS entities (
+    clause_id INTEGER NOT NULL REFERENCES clauses(id) ON DELETE CASCADE,
+    text TEXT NOT NULL,
+    label TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revisions (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    previous_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    summary TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (document_id, previous_id)
+);
+CREATE INDEX IF NOT EXISTS idx_clauses_document ON clauses(document_id, idx);
+CREATE INDEX IF NOT EXISTS idx_clauses_type ON clauses(type_id);
+CREATE INDEX IF NOT EXISTS idx_clause_terms_term ON clause_terms(term_id);
+CREATE INDEX IF NOT EXISTS idx_entities_clause ON entities(clause_id);
+CREATE INDEX IF NOT EXISTS idx_entities_label ON entities(label, text);
+"""
+
+# External-content FTS5 index over clauses.cleaned, kept in sync by the writes below
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS clauses_fts USING fts5(
+    cleaned, content='clauses', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+MAX_PAGE_SIZE = 500
+
+
+# -----------------------------------------------------------
+# SQLite results store
+# -----------------------------------------------------------
+class ResultsStore:
+    """
+    Analysis results in one SQLite database: documents, clauses, detected
+    types, recognized terms and entities, with an FTS5 index over cleaned
+    clause text when the SQLite build has FTS5. Each thread gets its own
+    connection; every document is written in a single transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.has_fts = self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> bool:
+        conn = self._connect()
+        with conn:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version={STORE_SCHEMA_VERSION}")
+            try:
+                conn.executescript(FTS_SCHEMA)
+                return True
+            except sqlite3.OperationalError:
+                return False
+
+    # -------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------
+    def _ids(self, conn, table: str, column: str, values: list, extra: dict = None) -> dict:
+        """Insert missing lookup rows (clause_types, terms) and return value -> id."""
+        values = list(dict.fromkeys(values))
+        if not values:
+            return {}
+        if extra is None:
+            conn.executemany(f"INSERT OR IGNORE INTO {table}({column}) VALUES (?)", [(v,) for v in values])
+        else:
+            conn.executemany(f"INSERT OR IGNORE INTO {table}({column}, definition) VALUES (?, ?)",
+                             [(v, extra.get(v)) for v in values])
+        ids = {}
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            rows = conn.execute(f"SELECT id, {column} FROM {table} WHERE {column} IN "
+                                f"({','.join('?' * len(chunk))})", chunk)
+            ids.update((row[1], row[0]) for row in rows)
+        return ids
+
+    def _delete_document(self, conn, document_id: int):
+        if self.has_fts:
+            conn.execute("INSERT INTO clauses_fts(clauses_fts, rowid, cleaned) "
+                         "SELECT 'delete', id, cleaned FROM clauses WHERE document_id = ?", (document_id,))
+        conn.execute("DELETE FROM clauses WHERE document_id = ?", (document_id,))
+
+    def _save(self, conn, sha256: str, filename: str, results: list, fingerprint: str, uploaded_by: str):
+        row = conn.execute("SELECT id FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is not None:
+            document_id = row[0]
+            self._delete_document(conn, document_id)
+            conn.execute("UPDATE documents SET filename = ?, uploaded_by = ?, fingerprint = ?, "
+                         "clause_count = ?, analyzed_at = ? WHERE id = ?",
+                         (filename, uploaded_by, fingerprint, len(results), time.time(), document_id))
+        else:
+            document_id = conn.execute(
+                "INSERT INTO documents(sha256, filename, uploaded_by, fingerprint, clause_count, analyzed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, filename, uploaded_by, fingerprint, len(results), time.time())).lastrowid
+
+        type_ids = self._ids(conn, "clause_types", "label", [r.get("type") or "Unknown" for r in results])
+        definitions = {t: d for r in results for t, d in (r.get("terms") or {}).items()}
+        term_ids = self._ids(conn, "terms", "term", list(definitions), extra=definitions)
+
+        term_rows, entity_rows, fts_rows = [], [], []
+        for r in results:
+            cursor = conn.execute(
+                "INSERT INTO clauses(document_id, idx, number, parent, page, raw, cleaned, type_id, "
+                "confidence, simple) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (document_id, r.get("index"), r.get("number"), r.get("parent"), r.get("page"), r.get("raw"),
+                 r.get("cleaned"), type_ids[r.get("type") or "Unknown"], r.get("confidence"), r.get("simple")))
+            clause_id = cursor.lastrowid
+            term_rows.extend((clause_id, term_ids[t]) for t in (r.get("terms") or {}))
+            entity_rows.extend((clause_id, text, label) for text, label in (r.get("entities") or []))
+            fts_rows.append((clause_id, r.get("cleaned") or ""))
+        conn.executemany("INSERT OR IGNORE INTO clause_terms(clause_id, term_id) VALUES (?, ?)", term_rows)
+        conn.executemany("INSERT INTO entities(clause_id, text, label) VALUES (?, ?, ?)", entity_rows)
+        if self.has_fts:
+            conn.executemany("INSERT INTO clauses_fts(rowid, cleaned) VALUES (?, ?)", fts_rows)
+        return document_id
+
+    def save_document(self, sha256: str, filename: str, results: list, fingerprint: str = None,
+                      uploaded_by: str = None) -> int:
+        """Store (or replace) one document's results; returns its document id."""
+        return self.save_documents([(sha256, filename, results)], fingerprint, uploaded_by)[0]
+
+    def save_documents(self, documents: list, fingerprint: str = None, uploaded_by: str = None) -> list:
+        """Store many (sha256, filename, results) tuples in one transaction."""
+        conn = self._connect()
+        with conn:
+            return [self._save(conn, sha256, filename, results, fingerprint, uploaded_by)
+                    for sha256, filename, results in documents]
+
+    # -------------------------------------------------------
+    # Queries (keyset pagination: pass back `next_cursor` as `cursor`)
+    # -------------------------------------------------------
+    def _filters(self, clause_type=None, term=None, q=None, document=None):
+        where, params = [], []
+        if clause_type:
+            where.append("c.type_id = (SELECT id FROM clause_types WHERE label = ?)")
+            params.append(clause_type)
+        if term:
+            where.append("c.id IN (SELECT ct.clause_id FROM clause_terms ct JOIN terms t ON t.id = ct.term_id "
+                         "WHERE t.term = ?)")
+            params.append(term.lower())
+        if q:
+            if self.has_fts:
+                where.append("c.id IN (SELECT rowid FROM clauses_fts WHERE clauses_fts MATCH ?)")
+                params.append(q)
+            else:
+                where.append("c.cleaned LIKE ?")
+                params.append(f"%{q}%")
+        if document:
+            where.append("d.sha256 = ?")
+            params.append(document)
+        return where, params
+
+    def query_clauses(self, clause_type=None, term=None, q=None, document=None,
+                      cursor: int = 0, limit: int = 50) -> dict:
+        """
+        Page through clauses matching every given filter: detected type,
+        recognized term, full-text query `q` (FTS5 syntax, e.g. '"force
+        majeure"') and document SHA-256.
+        Returns {"items": [...], "next_cursor": int or None}.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = self._filters(clause_type, term, q, document)
+        where.append("c.id > ?")
+        params.append(cursor or 0)
+        rows = self._connect().execute(
+            "SELECT c.id, d.sha256, d.filename, c.idx, c.number, c.parent, c.page, c.cleaned, "
+            "ty.label AS type, c.confidence, c.simple "
+            "FROM clauses c JOIN documents d ON d.id = c.document_id "
+            "LEFT JOIN clause_types ty ON ty.id = c.type_id "
+            f"WHERE {' AND '.join(where)} ORDER BY c.id LIMIT ?", params + [limit + 1]).fetchall()
+        items = [dict(row) for row in rows[:limit]]
+        if items:
+            self._attach_terms(items)
+        return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+    def _attach_terms(self, items: list):
+        ids = [item["id"] for item in items]
+        terms = {i: {} for i in ids}
+        rows = self._connect().execute(
+            "SELECT ct.clause_id, t.term, t.definition FROM clause_terms ct JOIN terms t ON t.id = ct.term_id "
+            f"WHERE ct.clause_id IN ({','.join('?' * len(ids))})", ids)
+        for clause_id, term, definition in rows:
+            terms[clause_id][term] = definition
+        for item in items:
+            item["terms"] = terms[item["id"]]
+
+    def iter_document_clauses(self, sha256: str, clause_type=None, term=None, cursor: int = 0,
+                              limit: int = 50, chunk_size: int = 100):
+        """
+        Yield up to `limit` clauses of one document in clause order, after
+        clause index `cursor`, filtered by type and term. Rows are fetched
+        and given their terms `chunk_size` at a time, so callers can stream
+        them; each page reads only its own rows from idx_clauses_document.
+        Items have the results-list fields except "raw" and "entities".
+        """
+        where, params = self._filters(clause_type, term, document=sha256)
+        where.append("c.idx > ?")
+        params.append(cursor or 0)
+        rows = self._connect().execute(
+            "SELECT c.id, c.idx AS \"index\", c.number, c.parent, c.page, c.cleaned, "
+            "ty.label AS type, c.confidence, c.simple "
+            "FROM clauses c JOIN documents d ON d.id = c.document_id "
+            "LEFT JOIN clause_types ty ON ty.id = c.type_id "
+            f"WHERE {' AND '.join(where)} ORDER BY c.idx LIMIT ?", params + [limit])
+        while True:
+            chunk = rows.fetchmany(chunk_size)
+            if not chunk:
+                return
+            items = [dict(row) for row in chunk]
+            self._attach_terms(items)
+            yield from items
+
+    def document_clauses(self, sha256: str, clause_type=None, term=None, cursor: int = 0, limit: int = 50) -> dict:
+        """One page of iter_document_clauses as {"items": [...], "next_cursor": clause index or None}."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        items = list(self.iter_document_clauses(sha256, clause_type, term, cursor, limit + 1))
+        return {"items": items[:limit], "next_cursor": items[limit - 1]["index"] if len(items) > limit else None}
+
+    def clause_types(self) -> list:
+        """Every clause type label stored so far, sorted."""
+        return [row[0] for row in self._connect().execute("SELECT label FROM clause_types ORDER BY label")]
+
+    def query_documents(self, clause_type=None, term=None, q=None, cursor: int = 0, limit: int = 50) -> dict:
+        """Page through documents with at least one clause matching the filters."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = self._filters(clause_type, term, q)
+        if where:
+            where = [f"d.id IN (SELECT c.document_id FROM clauses c JOIN documents d ON d.id = c.document_id "
+                     f"WHERE {' AND '.join(where)})"]
+        where.append("d.id > ?")
+        params.append(cursor or 0)
+        rows = self._connect().execute(
+            "SELECT d.id, d.sha256, d.filename, d.uploaded_by, d.clause_count, d.analyzed_at FROM documents d "
+            f"WHERE {' AND '.join(where)} ORDER BY d.id LIMIT ?", params + [limit + 1]).fetchall()
+        items = [dict(row) for row in rows[:limit]]
+        return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+    # -------------------------------------------------------
+    # Whole documents and revisions
+    # -------------------------------------------------------
+    def find_document(self, sha256: str = None, filename: str = None):
+        """Document row by hash, or the latest analysis of `filename`; None when absent."""
+        if sha256:
+            row = self._connect().execute("SELECT * FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        else:
+            row = self._connect().execute("SELECT * FROM documents WHERE filename = ? "
+                                          "ORDER BY analyzed_at DESC LIMIT 1", (filename,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def load_results(self, sha256: str) -> list:
+        """A stored document's results in the pipeline.analyze_clauses shape, in clause order."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT c.id, c.idx, c.number, c.parent, c.page, c.raw, c.cleaned, ty.label, c.confidence, c.simple "
+            "FROM clauses c JOIN documents d ON d.id = c.document_id "
+            "LEFT JOIN clause_types ty ON ty.id = c.type_id WHERE d.sha256 = ? ORDER BY c.idx",
+            (sha256,)).fetchall()
+        results = [{'index': r[1], 'raw': r[5], 'cleaned': r[6], 'number': r[2], 'parent': r[3], 'page': r[4],
+                    'entities': [], 'type': r[7], 'confidence': r[8], 'terms': {}, 'simple': r[9]}
+                   for r in rows]
+        by_id = {r[0]: result for r, result in zip(rows, results)}
+        if by_id:
+            min_id, max_id = min(by_id), max(by_id)
+            for clause_id, term, definition in conn.execute(
+                    "SELECT ct.clause_id, t.term, t.definition FROM clause_terms ct JOIN terms t ON t.id = ct.term_id "
+                    "WHERE ct.clause_id BETWEEN ? AND ?", (min_id, max_id)):
+                if clause_id in by_id:
+                    by_id[clause_id]['terms'][term] = definition
+            for clause_id, text, label in conn.execute(
+                    "SELECT clause_id, text, label FROM entities WHERE clause_id BETWEEN ? AND ?", (min_id, max_id)):
+                if clause_id in by_id:
+                    by_id[clause_id]['entities'].append((text, label))
+        return results
+
+    def link_revision(self, sha256: str, previous_sha256: str, summary: dict = None):
+        """Record that document `sha256` is a revision of `previous_sha256`."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO revisions(document_id, previous_id, summary, created_at) "
+                "SELECT d.id, p.id, ?, ? FROM documents d, documents p WHERE d.sha256 = ? AND p.sha256 = ?",
+                (json.dumps(summary) if summary is not None else None, time.time(), sha256, previous_sha256))
+
+    # -------------------------------------------------------
+    # Clause lookups for the embedding index
+    # -------------------------------------------------------
+    def clause_texts(self, document_id: int = None, after_id: int = 0, limit: int = None) -> list:
+        """(clause id, cleaned text) pairs of one document, or of all clauses after `after_id`."""
+        if document_id is not None:
+            return self._connect().execute("SELECT id, cleaned FROM clauses WHERE document_id = ? ORDER BY id",
+                                           (document_id,)).fetchall()
+        return self._connect().execute("SELECT id, cleaned FROM clauses WHERE id > ? ORDER BY id LIMIT ?",
+                                       (after_id, limit or -1)).fetchall()
+
+    def get_clauses(self, ids: list) -> list:
+        """Clauses by id, in the query_clauses item shape (missing ids are skipped)."""
+        if not ids:
+            return []
+        rows = self._connect().execute(
+            "SELECT c.id, d.sha256, d.filename, c.idx, c.number, c.parent, c.page, c.cleaned, "
+            "ty.label AS type, c.confidence, c.simple "
+            "FROM clauses c JOIN documents d ON d.id = c.document_id "
+            "LEFT JOIN clause_types ty ON ty.id = c.type_id "
+            f"WHERE c.id IN ({','.join('?' * len(ids))})", list(ids)).fetchall()
+        items = [dict(row) for row in rows]
+        if items:
+            self._attach_terms(items)
+        return items
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
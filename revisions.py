@@ -0,0 +1,208 @@
+import re
+import difflib
+
+from analysis_cache import normalize_clause
+from pipeline import analyze_clauses
+from metrics import increment
+
+# Unmatched clauses at least this similar are treated as edits of each other
+MODIFIED_SIMILARITY = 0.6
+# Leading clause-number marker ("1.", "2.3", "4)", "(a)", "(iv)"), as mod2_preprocess segments them;
+# left out of the alignment key so renumbered clauses still match
+_NUMBER_MARKER = re.compile(r'^(?:\d{1,2}(?:\.\d{1,2})+[.)]?|\d{1,2}[.)]|\((?:[a-z]{1,2}|[ivxl]{1,5})\))\s+')
+
+
+# -----------------------------------------------------------
+# Clause alignment
+# -----------------------------------------------------------
+def _alignment_key(clause: dict) -> str:
+    """Whitespace-normalized clause text without its leading number marker."""
+    text = normalize_clause(clause.get('cleaned', clause.get('cleaned_text', '')))
+    return _NUMBER_MARKER.sub('', text, count=1)
+
+
+def _similarity(a: str, b: str) -> float:
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    # quick_ratio is an upper bound; skip the full diff for clearly different clauses
+    if matcher.quick_ratio() < MODIFIED_SIMILARITY:
+        return 0.0
+    return matcher.ratio()
+
+
+def _pair_block(old_keys, new_keys, old_numbers, new_numbers, old_ids, new_ids) -> list:
+    """
+    Pair the clauses of one differing block: same clause number first, if
+    the two are at least MODIFIED_SIMILARITY alike, then the most similar
+    remaining clause above MODIFIED_SIMILARITY.
+    Returns (old_index, new_index, similarity) tuples; unmatched sides are None.
+    """
+    pairs, used_old = [], set()
+    unmatched_new = []
+    by_number = {}
+    for i in old_ids:
+        if old_numbers[i]:
+            by_number.setdefault(old_numbers[i], i)
+    for j in new_ids:
+        i = by_number.get(new_numbers[j]) if new_numbers[j] else None
+        if i is not None and i not in used_old:
+            # Renumbering moves numbers between unrelated clauses; keep only similar pairs
+            score = _similarity(old_keys[i], new_keys[j])
+            if score >= MODIFIED_SIMILARITY:
+                used_old.add(i)
+                pairs.append((i, j, score))
+                continue
+        unmatched_new.append(j)
+
+    for j in unmatched_new:
+        best, best_score = None, MODIFIED_SIMILARITY
+        for i in old_ids:
+            if i in used_old:
+                continue
+            score = _similarity(old_keys[i], new_keys[j])
+            if score >= best_score:
+                best, best_score = i, score
+        if best is None:
+            pairs.append((None, j, 0.0))
+        else:
+            used_old.add(best)
+            pairs.append((best, j, best_score))
+    pairs.extend((i, None, 0.0) for i in old_ids if i not in used_old)
+    return pairs
+
+
+def align_clauses(old_clauses: list, new_clauses: list) -> list:
+    """
+    Align two versions of a contract clause by clause. Each side is a list
+    of dicts with 'cleaned' (or 'cleaned_text') and optional 'number'.
+
+    Identical clauses are found with difflib over whitespace-normalized
+    text without the leading number marker, so renumbering alone does not
+    count as an edit; clauses in the blocks between them are paired by clause number,
+    then by text similarity. Returns (status, old_index, new_index,
+    similarity) tuples with status 'unchanged', 'modified', 'inserted' or
+    'deleted', ordered by position in the new version.
+    """
+    old_keys = [_alignment_key(c) for c in old_clauses]
+    new_keys = [_alignment_key(c) for c in new_clauses]
+    old_numbers = [c.get('number') for c in old_clauses]
+    new_numbers = [c.get('number') for c in new_clauses]
+
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.extend(('unchanged', i, j, 1.0) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+        for i, j, score in _pair_block(old_keys, new_keys, old_numbers, new_numbers,
+                                       range(i1, i2), range(j1, j2)):
+            if i is None:
+                ops.append(('inserted', None, j, 0.0))
+            elif j is None:
+                ops.append(('deleted', i, None, 0.0))
+            else:
+                ops.append(('unchanged' if old_keys[i] == new_keys[j] else 'modified', i, j, round(score, 4)))
+
+    # New-version order, deletions placed after the clause that preceded them
+    def position(op):
+        _, i, j, _ = op
+        if j is not None:
+            return (j, 0)
+        earlier = [o[2] for o in ops if o[1] is not None and o[1] < i and o[2] is not None]
+        return (max(earlier) if earlier else -1, 1)
+    return sorted(ops, key=position)
+
+
+def word_diff(old: str, new: str) -> list:
+    """Word-level diff as [("equal"|"insert"|"delete", text), ...]."""
+    a, b = old.split(), new.split()
+    out = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            out.append(('equal', ' '.join(a[i1:i2])))
+        else:
+            if i2 > i1:
+                out.append(('delete', ' '.join(a[i1:i2])))
+            if j2 > j1:
+                out.append(('insert', ' '.join(b[j1:j2])))
+    return out
+
+
+# -----------------------------------------------------------
+# Incremental re-analysis
+# -----------------------------------------------------------
+# Fields reused from stored results; the window count is not stored, so reused clauses omit it
+ANALYSIS_FIELDS = ('type', 'confidence', 'terms', 'simple')
+
+
+def analyze_revision(previous_results: list, processed_clauses: list, profile: str = "quality",
+                     reuse: bool = True, progress=None, embed: bool = False) -> tuple:
+    """
+    Analyze a new version of a contract given the stored results of an
+    earlier one. Unchanged clauses reuse their earlier analysis; only
+    inserted and modified clauses go through the model stages. Pass
+    `reuse=False` when the earlier results came from different models,
+    to rerun every clause but still get the redline. `embed` is passed to
+    analyze_clauses for the rerun clauses.
+
+    Returns (results, redline). `results` has the same shape as
+    pipeline.analyze_clauses; `redline` has one entry per aligned clause
+    with its status, similarity, type change, term changes and a word diff
+    for modified clauses.
+    """
+    ops = align_clauses(previous_results, processed_clauses)
+    rerun = sorted(j for status, _, j, _ in ops
+                   if j is not None and (not reuse or status in ('inserted', 'modified')))
+    analyzed = {}
+    if rerun:
+        analyzed = dict(zip(rerun, analyze_clauses([processed_clauses[j] for j in rerun], profile=profile,
+                                                   progress=progress, embed=embed)))
+    increment("clauseease_revision_reused_clauses_total", len(processed_clauses) - len(rerun))
+
+    results = [None] * len(processed_clauses)
+    redline = []
+    for status, i, j, similarity in ops:
+        old = previous_results[i] if i is not None else None
+        if j is not None:
+            c = processed_clauses[j]
+            result = analyzed.get(j)
+            if result is None:
+                result = {
+                    'raw': c['raw_text'],
+                    'cleaned': c['cleaned_text'],
+                    'number': c.get('number'),
+                    'parent': c.get('parent'),
+                    'page': c.get('page'),
+                    'entities': c.get('entities', []),
+                    **{k: old.get(k) for k in ANALYSIS_FIELDS}
+                }
+            result['index'] = j + 1
+            results[j] = result
+        new = results[j] if j is not None else None
+
+        old_terms = set((old or {}).get('terms') or {})
+        new_terms = set((new or {}).get('terms') or {})
+        entry = {
+            'status': status,
+            'old_index': old.get('index') if old else None,
+            'new_index': j + 1 if j is not None else None,
+            'number': (new or old).get('number'),
+            'similarity': similarity,
+            'type_before': old.get('type') if old else None,
+            'type_after': new.get('type') if new else None,
+            'terms_added': sorted(new_terms - old_terms),
+            'terms_removed': sorted(old_terms - new_terms),
+        }
+        if status == 'modified':
+            entry['diff'] = word_diff(old.get('cleaned', ''), new['cleaned'])
+        redline.append(entry)
+    return results, redline
+
+
+def redline_summary(redline: list) -> dict:
+    """Counts per status plus how many clauses changed type."""
+    summary = {'unchanged': 0, 'modified': 0, 'inserted': 0, 'deleted': 0, 'type_changed': 0}
+    for entry in redline:
+        summary[entry['status']] += 1
+        if entry['status'] == 'modified' and entry['type_before'] != entry['type_after']:
+            summary['type_changed'] += 1
+    return summary
@@ -0,0 +1,96 @@
+"""
+Content-addressed storage for uploaded documents.
+
+An upload is held in memory once it has been read from the request (see
+flask_app.InMemoryUploadRequest): its bytes are hashed there and handed to
+extraction as they are (mod1_docingestion takes them via `data=`), and the
+file is written to
+`<directory>/<sha[:2]>/<sha><ext>` only if those bytes are not stored yet.
+Two uploads never share a path unless their contents are identical, so
+concurrent uploads with the same filename cannot overwrite each other.
+"""
+import io
+import os
+import hashlib
+import threading
+
+from metrics import increment
+
+
+class Upload:
+    """One received upload: its bytes, their SHA-256 and where they are stored."""
+    __slots__ = ("sha256", "filename", "data", "path", "created")
+
+    def __init__(self, sha256: str, filename: str, data: bytes, path: str, created: bool):
+        self.sha256 = sha256
+        self.filename = filename
+        self.data = data
+        self.path = path
+        self.created = created  # False when identical bytes were already stored
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+class UploadStore:
+    """Uploads stored once per distinct content under `directory`."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256 + ext.lower())
+
+    def ingest(self, stream, filename: str, chunk_size: int = 1 << 16) -> Upload:
+        """
+        Take the bytes of `stream` and store them under their hash unless
+        already present. An io.BytesIO is used as it is; other streams are
+        read to the end in chunks, hashing while reading. `filename`
+        (already made safe by the caller) supplies the extension and the
+        display name.
+        """
+        if isinstance(stream, io.BytesIO):
+            data = stream.getvalue()
+            sha256 = hashlib.sha256(data).hexdigest()
+        else:
+            digest = hashlib.sha256()
+            chunks = []
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                digest.update(chunk)
+                chunks.append(chunk)
+            data = b"".join(chunks)
+            sha256 = digest.hexdigest()
+        increment("clauseease_upload_bytes_total", len(data))
+
+        path = self.path_for(sha256, os.path.splitext(filename)[1])
+        created = not os.path.exists(path)
+        if created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as fh:
+                    fh.write(data)
+                # Identical concurrent uploads both land here; either copy is the same bytes
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        else:
+            increment("clauseease_uploads_deduplicated_total")
+        return Upload(sha256, filename, data, path, created)
+
+    def find(self, sha256: str):
+        """Stored path of the upload with this hash (any extension), or None."""
+        if not sha256 or len(sha256) != 64 or not all(c in "0123456789abcdef" for c in sha256):
+            return None
+        shard = os.path.join(self.directory, sha256[:2])
+        try:
+            names = os.listdir(shard)
+        except OSError:
+            return None
+        for name in names:
+            if name.startswith(sha256) and not name.endswith((".tmp", ".results.json")):
+                return os.path.join(shard, name)
+        return None